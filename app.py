@@ -1,27 +1,38 @@
 import streamlit as st
-import pandas as pd
-import warnings
-import openai
 import datetime
 import os
+import time
 
 from dotenv import load_dotenv
 
-from core.state import init_session_state
+from core.config import PROGRESSIVE_MIN_ROWS
+from core.state import init_session_state, current_session_id
 from core.data_loader import sidebar_file_upload
 from core.export_report import export_conversation
 from core.prompts import build_system_prompt
-from core.llm_client import generate_llm_response
-from core.code_runner import execute_code_blocks
+from core.llm_client import stream_llm_response
+from core.llm_transport import get_llm_client
+from core.code_runner import extract_code_blocks, run_code_block, record_reply
+from core.code_cache import code_cache
+from core.results import StoredResult
 from core.ui_components import (
     render_chat_history,
+    render_result,
+    render_sql_export,
     show_no_data_screen,
-    show_data_health_report
+    show_data_health_report,
+    show_performance_panel
 )
 
 # SQL mode imports (NEW)
 from core.sql_prompt import build_sql_prompt
-from core.sql_engine import execute_sql_query
+from core.sql_engine import execute_sql, result_cache
+from core.duckdb_manager import connection_manager
+from core.rollup import schedule_rollup
+from core.scheduler import scheduler
+from core.dataset_store import dataset_store
+from core.workspace import workspace_fingerprint, workspace_tables
+from core.tracing import span, trace
 
 # Load .env file
 load_dotenv()
@@ -32,12 +43,12 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize OpenAI client
+# Initialize OpenAI client (shared by all sessions: retries, timeouts, rate limits)
 api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     st.error("❌ OPENAI_API_KEY missing! Check your .env file.")
 else:
-    client = openai.OpenAI(api_key=api_key)
+    client = get_llm_client(api_key)
 
 # Initialize session state
 init_session_state()
@@ -60,6 +71,85 @@ with st.sidebar:
         help="Python = flexible analysis | SQL = fast, large datasets"
     )
 
+    st.session_state.llm_cache_enabled = st.checkbox(
+        "Reuse cached answers",
+        value=st.session_state.llm_cache_enabled,
+        help="Answer repeated questions from the local response cache instead of calling the model again"
+    )
+
+    if st.session_state.analysis_engine == "Python":
+        st.session_state.progressive_enabled = st.checkbox(
+            "Preview on a sample first",
+            value=st.session_state.progressive_enabled,
+            help=f"On datasets of {PROGRESSIVE_MIN_ROWS:,}+ rows, show a result from a stratified sample "
+                 "right away while the full-data run finishes in the background"
+        )
+        code_stats = code_cache.stats()
+        st.caption(
+            f"Code result cache: {code_stats['hits']} hits · {code_stats['misses']} misses · "
+            f"{code_stats['entries']} entries ({code_stats['bytes'] / 1024 / 1024:.1f} / "
+            f"{code_stats['max_bytes'] / 1024 / 1024:.0f} MB)"
+        )
+
+    if st.session_state.analysis_engine == "SQL":
+        cache_stats = result_cache.stats()
+        st.caption(
+            f"SQL result cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+            f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 1024 / 1024:.1f} / "
+            f"{cache_stats['max_bytes'] / 1024 / 1024:.0f} MB)"
+        )
+
+        st.session_state.rollups_enabled = st.checkbox(
+            "Use pre-aggregated rollups",
+            value=st.session_state.rollups_enabled,
+            help="Answer GROUP BY queries over low-cardinality columns from a small pre-aggregated "
+                 "table instead of scanning every row"
+        )
+        if st.session_state.rollups_enabled and st.session_state.df is not None:
+            schedule_rollup(
+                current_session_id(),
+                workspace_fingerprint(),
+                st.session_state.df,
+                workspace_tables(),
+                st.session_state.data_profile
+            )
+
+            conn = connection_manager.peek(current_session_id())
+            rollup = conn.rollup if conn is not None else None
+            if rollup is not None:
+                dimensions = rollup.dimensions + ([f"{rollup.date_column} (month)"] if rollup.date_column else [])
+                st.caption(
+                    f"Rollup: {rollup.rows:,} rows for {rollup.base_rows:,} · by {', '.join(dimensions)}"
+                )
+            else:
+                st.caption(f"Rollup: {(conn.rollup_status if conn is not None else None) or 'building'}")
+
+            if st.session_state.rollup_log:
+                with st.expander(f"⚡ Accelerated queries ({len(st.session_state.rollup_log)})"):
+                    for entry in reversed(st.session_state.rollup_log):
+                        st.code(entry["sql"], language="sql")
+                        st.caption(f"Ran as: {entry['rewritten_sql']}")
+
+    # Shared by every session: how busy the box is right now
+    load = scheduler.stats()
+    st.caption(f"Server load: {load['running']} of {load['slots']} slots busy · {load['queued']} queued")
+    shared = dataset_store.stats()
+    st.caption(
+        f"Shared datasets: {shared['entries']} loaded ({shared['referenced']} in use) · "
+        f"{shared['bytes'] / 1024 / 1024:.1f} / {shared['max_bytes'] / 1024 / 1024:.0f} MB"
+    )
+
+    # Per-session memory: chat history window + chart PNGs held in RAM
+    if st.session_state.messages:
+        conversation = st.session_state.messages.stats()
+        figures = st.session_state.figure_store.stats()
+        st.caption(
+            f"Session memory: {conversation['memory_bytes'] / 1024:.0f} KB for "
+            f"{conversation['in_memory']} of {conversation['messages']} messages "
+            f"({conversation['disk_bytes'] / 1024:.0f} KB on disk) · "
+            f"{figures['bytes'] / 1024:.0f} KB of charts"
+        )
+
 # ---- Data Health Report (existing feature) ----
 show_data_health_report()
 
@@ -69,13 +159,15 @@ if st.session_state.messages:
         st.markdown("---")
         st.header("💾 Export Options")
         if st.button("Generate Report"):
-            export_html = export_conversation()
-            st.download_button(
-                label="📥 Download Report (HTML)",
-                data=export_html,
-                file_name=f"data_analysis_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.html",
-                mime="text/html"
-            )
+            with span("report.export"):
+                report_path = export_conversation()
+            with open(report_path, "rb") as report:
+                st.download_button(
+                    label="📥 Download Report (HTML)",
+                    data=report,
+                    file_name=f"data_analysis_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.html",
+                    mime="text/html"
+                )
             st.info("💡 Tip: Open the HTML file and print to PDF for best results")
 
 # ---- Main interface ----
@@ -96,60 +188,111 @@ if st.session_state.df is not None:
 
         engine = st.session_state.analysis_engine
 
-        # ---- SQL MODE ----
-        if engine == "SQL":
-            sql_prompt = build_sql_prompt(st.session_state.data_summary)
-
-            with st.chat_message("assistant"):
-                with st.spinner("Running SQL analysis..."):
-
-                    sql_query = generate_llm_response(
-                        client=client,
-                        system_prompt=sql_prompt,
-                        user_input=user_input
-                    )
-
-                    st.code(sql_query, language="sql")
-
-                    try:
-                        result_df = execute_sql_query(
-                            st.session_state.df,
-                            sql_query
-                        )
-
-                        st.write(result_df)
-
-                        st.session_state.messages.append({
-                            "role": "assistant",
-                            "content": f"SQL Query:\n{sql_query}",
-                            "output": result_df
-                        })
-
-                    except Exception as e:
-                        st.error(str(e))
-
-        # ---- PYTHON MODE (UNCHANGED) ----
-        else:
-            system_prompt = build_system_prompt()
-
-            with st.chat_message("assistant"):
-                message_placeholder = st.empty()
-                with st.spinner("Analyzing your data..."):
-
-                    reply = generate_llm_response(
-                        client=client,
-                        system_prompt=system_prompt,
-                        user_input=user_input
-                    )
-
-                    message_placeholder.markdown(reply)
-
-                    # Execute python code if found
-                    execute_code_blocks(reply)
+        # One trace per question: prompt, LLM, SQL/code, serialisation and render
+        with trace("question", sink=st.session_state.traces, engine=engine, question=user_input[:200]):
+            # ---- SQL MODE ----
+            if engine == "SQL":
+                with span("prompt.build"):
+                    sql_prompt = build_sql_prompt()
+
+                with st.chat_message("assistant"):
+                    with st.spinner("Running SQL analysis..."):
+
+                        # Stream the query into the code box as it is written
+                        sql_placeholder = st.empty()
+                        sql_query = ""
+                        for delta in stream_llm_response(
+                            client=client,
+                            system_prompt=sql_prompt,
+                            user_input=user_input,
+                            use_cache=st.session_state.llm_cache_enabled
+                        ):
+                            sql_query += delta
+                            sql_placeholder.code(sql_query, language="sql")
+
+                        try:
+                            fingerprint = workspace_fingerprint()
+                            sql_result = execute_sql(
+                                st.session_state.df,
+                                sql_query,
+                                fingerprint=fingerprint,
+                                session_id=current_session_id(),
+                                tables=workspace_tables(),
+                                use_rollup=st.session_state.rollups_enabled
+                            )
+
+                            # Kept as compressed Parquet; only the shown page becomes pandas
+                            with span("result.serialize"):
+                                result = StoredResult.from_table(sql_result.table, sql_result.total_rows)
+                            with span("render"):
+                                render_result(result)
+                                if sql_result.rewritten_sql is not None:
+                                    st.caption("⚡ Answered from the pre-aggregated rollup")
+                                    st.session_state.rollup_log.append({
+                                        "sql": sql_query,
+                                        "rewritten_sql": sql_result.rewritten_sql
+                                    })
+                                if sql_result.truncated:
+                                    render_sql_export(
+                                        sql_query, fingerprint, key=f"sql_{len(st.session_state.messages)}"
+                                    )
+
+                            st.session_state.messages.append({
+                                "role": "assistant",
+                                "content": f"SQL Query:\n{sql_query}",
+                                "output": result,
+                                "sql": sql_query,
+                                "fingerprint": fingerprint
+                            })
+
+                        except Exception as e:
+                            st.error(str(e))
+
+            # ---- PYTHON MODE ----
+            else:
+                with span("prompt.build"):
+                    system_prompt = build_system_prompt()
+
+                with st.chat_message("assistant"):
+                    message_placeholder = st.empty()
+                    with st.spinner("Analyzing your data..."):
+
+                        reply = ""
+                        outputs = []
+                        last_render = 0.0
+
+                        for delta in stream_llm_response(
+                            client=client,
+                            system_prompt=system_prompt,
+                            user_input=user_input,
+                            use_cache=st.session_state.llm_cache_enabled
+                        ):
+                            reply += delta
+
+                            # Redraw at most ~20 times a second
+                            if time.monotonic() - last_render > 0.05:
+                                message_placeholder.markdown(reply + "▌")
+                                last_render = time.monotonic()
+
+                            # Run each python block as soon as its closing fence arrives
+                            for code in extract_code_blocks(reply)[len(outputs):]:
+                                message_placeholder.markdown(reply)
+                                outputs.append(run_code_block(code))
+
+                        message_placeholder.markdown(reply)
+
+                        # Execute python code if found (including an unclosed last block)
+                        for code in extract_code_blocks(reply, complete=True)[len(outputs):]:
+                            outputs.append(run_code_block(code))
+
+                        record_reply(reply, outputs)
 
 else:
     show_no_data_screen()
 
+# ---- Performance panel (last, so it includes this run's question) ----
+show_performance_panel()
+
 # ---- Footer ----
 st.markdown("---")
 st.markdown(
@@ -0,0 +1,339 @@
+"""
+Benchmark the data paths on synthetic datasets.
+
+    python -m benchmarks.run --rows 10k,1m --columns 10,100
+    python -m benchmarks.run --save-baseline      # record this machine's baseline
+    python -m benchmarks.run --threshold 0.25     # fail on >25% regressions
+"""
+import argparse
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, ".data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# Settings are read when `core` is imported: keep snapshots and caches out of the real .cache
+WORK_DIR = tempfile.mkdtemp(prefix="ask_csv_bench_")
+os.environ["ASK_CSV_CACHE_DIR"] = WORK_DIR
+os.environ.setdefault("ASK_CSV_SHARED_DATASET_DIR", os.path.join(WORK_DIR, "shared"))
+
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from benchmarks.synthetic import generate_csv, parse_rows  # noqa: E402
+
+SQL_QUERIES = [
+    'SELECT "Customer Region", SUM("Total Amount") AS total FROM df GROUP BY 1 ORDER BY 2 DESC',
+    'SELECT COUNT(*) FROM df WHERE "Quantity" >= 3 AND "Payment Method" = \'PayPal\'',
+    'SELECT "Product Name", AVG("Unit Price") AS avg_price FROM df GROUP BY 1 ORDER BY 2 DESC LIMIT 10'
+]
+
+STUB_REPLY = """Here is the breakdown:
+```python
+result = df.groupby("Customer Region")["Total Amount"].sum().sort_values(ascending=False)
+print(result.head())
+plt.figure(figsize=(10, 6))
+result.plot(kind="bar")
+plt.tight_layout()
+result
+```
+Northeast leads on revenue."""
+
+
+# ---- Stub LLM: streams a canned reply so the code path runs without the API ----
+
+class _StubCompletions:
+    def create(self, model, messages, stream=False, **kwargs):
+        chunks = [STUB_REPLY[i:i + 16] for i in range(0, len(STUB_REPLY), 16)]
+        return (
+            types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=c))])
+            for c in chunks
+        )
+
+
+class StubLLM:
+    def __init__(self):
+        self.chat = types.SimpleNamespace(completions=_StubCompletions())
+
+
+class Upload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(path)
+        self.size = len(self.getvalue())
+        self.file_id = path
+
+
+# ---- Measurement ----
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _descendants(pid):
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        return []
+    return children + [grandchild for child in children for grandchild in _descendants(child)]
+
+
+def tree_rss_bytes():
+    """Resident memory of this process and its children (code workers), Linux only."""
+    pid = os.getpid()
+    return sum(_rss_bytes(p) for p in [pid] + _descendants(pid))
+
+
+class PeakRSS:
+    """Samples the process tree's RSS in the background; `peak` is the growth over the starting RSS."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._start = tree_rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, tree_rss_bytes() - self._start)
+            if self._stop.wait(self.interval):
+                return
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def measure(fn, repeat, setup=None):
+    """
+    Median wall time over `repeat` runs, then one more run for peak RSS growth.
+    Memory is sampled in its own pass so the sampler doesn't slow the timed runs;
+    RSS covers native (DuckDB, Arrow) allocations and the worker processes too.
+    """
+    seconds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    with PeakRSS() as rss:
+        fn()
+
+    return {
+        "seconds": round(statistics.median(seconds), 4),
+        "runs": [round(s, 4) for s in seconds],
+        "peak_rss_mb": round(rss.peak / 1024 / 1024, 2) if sys.platform.startswith("linux") else None
+    }
+
+
+def run_scenario(path, repeat):
+    import streamlit as st
+
+    from core import prompt_context
+    from core.code_cache import code_cache
+    from core.code_runner import execute_code_blocks
+    from core.data_loader import load_dataset
+    from core.dataset_cache import content_hash
+    from core.dataset_store import dataset_store
+    from core.duckdb_manager import connection_manager
+    from core.llm_client import stream_llm_response
+    from core.profiler import profile_dataframe
+    from core.prompts import build_system_prompt
+    from core.sql_engine import execute_sql_query
+    from core.state import init_session_state
+
+    init_session_state()
+    upload = Upload(path)
+    results = {}
+
+    # ---- Ingestion: the path sidebar_file_upload takes for a new file ----
+    def fresh_ingest():
+        dataset_store.clear()
+        shutil.rmtree(os.path.join(WORK_DIR, "datasets"), ignore_errors=True)
+
+    def ingest():
+        load_dataset(upload, content_hash(upload))
+
+    results["ingest"] = measure(ingest, repeat, setup=fresh_ingest)
+    results["ingest_snapshot"] = measure(ingest, repeat, setup=dataset_store.clear)
+    # Another session uploading the same file: attaches to the copy already in memory
+    results["ingest_shared"] = measure(ingest, repeat)
+
+    df = st.session_state.df
+    results["profile"] = measure(lambda: profile_dataframe(df), repeat)
+
+    # Cold build each time; the digest cache would otherwise make this free
+    results["prompt"] = measure(build_system_prompt, repeat, setup=prompt_context._digests.clear)
+
+    # ---- SQL: table load into DuckDB, then queries on the warm connection ----
+    session = "benchmark"
+
+    def sql_load():
+        connection_manager.close(session)
+        connection_manager.get(session, st.session_state.dataset_hash, df)
+
+    def sql_queries():
+        for sql in SQL_QUERIES:
+            # No fingerprint -> the result cache is bypassed
+            execute_sql_query(df, sql, session_id=session)
+
+    results["sql_load"] = measure(sql_load, repeat)
+    results["sql"] = measure(sql_queries, repeat)
+    connection_manager.close(session)
+
+    # ---- Code execution: stub reply -> worker process -> rendered outputs ----
+    def code():
+        reply = "".join(stream_llm_response(StubLLM(), build_system_prompt(), "Revenue by region?", use_cache=False))
+        execute_code_blocks(reply)
+
+    code()  # starts the worker and shares the dataset with it
+    # Every run executes the block; the repeat served from the code cache is timed on its own
+    results["code"] = measure(code, repeat, setup=code_cache.clear)
+    results["code_cached"] = measure(code, repeat)
+
+    return results
+
+
+# ---- Reporting ----
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """Lines describing each stage against the baseline, and whether any regressed."""
+    lines, regressed = [], False
+    for scenario, stages in results.items():
+        for stage, current in stages.items():
+            before = baseline.get(scenario, {}).get(stage)
+            if before is None:
+                lines.append(f"{scenario:<22} {stage:<16} {current['seconds']:>9.3f}s   (no baseline)")
+                continue
+
+            ratio = current["seconds"] / before["seconds"] if before["seconds"] else 1.0
+            # Baselines from before RSS was measured (or off Linux) have no comparable memory figure
+            memory_before = before.get("peak_rss_mb")
+            memory_ratio = (
+                current["peak_rss_mb"] / memory_before if memory_before and current["peak_rss_mb"] is not None else 1.0
+            )
+            flag = ""
+            if ratio > 1 + threshold or memory_ratio > 1 + memory_threshold:
+                flag = "  REGRESSION"
+                regressed = True
+
+            lines.append(
+                f"{scenario:<22} {stage:<16} {current['seconds']:>9.3f}s  {ratio:>6.2f}x time  "
+                f"{memory_ratio:>6.2f}x memory{flag}"
+            )
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10k", help="comma-separated row counts (10k, 1m, 20m or integers)")
+    parser.add_argument("--columns", default="10", help="comma-separated column counts (10 to 500)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = {}
+    try:
+        for rows_label in args.rows.split(","):
+            for columns in (int(c) for c in args.columns.split(",")):
+                rows = parse_rows(rows_label)
+                scenario = f"{rows_label}x{columns}"
+                path = generate_csv(os.path.join(DATA_DIR, f"orders_{rows}x{columns}.csv"), rows, columns)
+
+                print(f"Running {scenario} ...", flush=True)
+                results[scenario] = run_scenario(path, args.repeat)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    else:
+        print(f"No baseline at {args.baseline}: record one with --save-baseline (see README, Benchmarks)")
+
+    lines, regressed = compare(results, baseline, args.threshold, args.memory_threshold)
+    print("\n".join(lines))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
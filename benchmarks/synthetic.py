@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Same shape as sample_data1.csv
+REGIONS = ["Northeast", "South", "West", "Midwest"]
+PRODUCTS = {
+    "Electronics": ["Noise Cancelling Headphones", "Bluetooth Speaker", "Phone Charger", "Wireless Mouse"],
+    "Fitness": ["Resistance Bands", "Adjustable Dumbbells", "Yoga Mat", "Foam Roller"],
+    "Home Essentials": ["Electric Kettle", "Coffee Maker", "LED Desk Lamp", "Air Purifier"]
+}
+PAYMENT_METHODS = ["Credit Card", "PayPal", "Apple Pay"]
+BASE_COLUMNS = 9
+CHUNK_ROWS = 500_000
+
+ROW_PRESETS = {"10k": 10_000, "1m": 1_000_000, "20m": 20_000_000}
+
+
+def parse_rows(label):
+    return ROW_PRESETS.get(label.lower()) or int(label)
+
+
+def _chunk(rng, start, rows, columns):
+    product_names = [name for names in PRODUCTS.values() for name in names]
+    categories = [category for category, names in PRODUCTS.items() for _ in names]
+
+    product = rng.integers(0, len(product_names), rows)
+    quantity = rng.integers(1, 6, rows)
+    unit_price = np.round(rng.uniform(15, 150, rows), 2)
+
+    frame = pd.DataFrame({
+        "Order ID": [f"NG-{i}" for i in range(start + 1001, start + 1001 + rows)],
+        "Order Date": (np.datetime64("2024-01-01") + rng.integers(0, 366, rows)).astype("datetime64[D]"),
+        "Customer Region": np.array(REGIONS)[rng.integers(0, len(REGIONS), rows)],
+        "Product Category": np.array(categories)[product],
+        "Product Name": np.array(product_names)[product],
+        "Quantity": quantity,
+        "Unit Price": unit_price,
+        "Total Amount": np.round(quantity * unit_price, 2),
+        "Payment Method": np.array(PAYMENT_METHODS)[rng.integers(0, len(PAYMENT_METHODS), rows)]
+    })
+
+    # Wider variants: alternate numeric measures and low-cardinality segments
+    for i in range(columns - BASE_COLUMNS):
+        if i % 2 == 0:
+            frame[f"Metric {i}"] = np.round(rng.normal(100, 25, rows), 3)
+        else:
+            frame[f"Segment {i}"] = np.array([f"S{k}" for k in range(8)])[rng.integers(0, 8, rows)]
+
+    return frame.iloc[:, :max(columns, 1)]
+
+
+def generate_csv(path, rows, columns, seed=42):
+    """Write a synthetic orders CSV chunk by chunk, so 20M rows never sit in memory at once."""
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    with open(path + ".tmp", "w", newline="") as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = _chunk(rng, start, min(CHUNK_ROWS, rows - start), columns)
+            chunk.to_csv(f, index=False, header=start == 0)
+
+    os.replace(path + ".tmp", path)
+    return path
@@ -0,0 +1,143 @@
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+
+from core.config import CODE_RESULT_CACHE_MB, LARGE_DATASET_MAX_ROWS
+from core.large_dataset import LargeDataset
+
+# Calls whose result changes from run to run (random draws, clocks, ids)
+NON_DETERMINISTIC_NAMES = {
+    "random", "rand", "randn", "randint", "random_sample", "default_rng", "seed",
+    "sample", "shuffle", "permutation", "choice", "choices", "getrandbits", "urandom",
+    "now", "today", "utcnow", "time", "perf_counter", "monotonic", "uuid1", "uuid4",
+}
+NON_DETERMINISTIC_MODULES = {"random", "secrets", "uuid", "time"}
+# Pandas sampling is reproducible once it is given a seed
+SEEDED_KEYWORDS = {"random_state", "seed"}
+
+
+def _is_seeded(call):
+    return any(
+        kw.arg in SEEDED_KEYWORDS and not (isinstance(kw.value, ast.Constant) and kw.value.value is None)
+        for kw in call.keywords
+    )
+
+
+def is_deterministic(tree):
+    """False if the code draws random numbers, reads the clock or makes ids (seeded `.sample()` is fine)."""
+    seeded = {
+        id(node.func) for node in ast.walk(tree)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and _is_seeded(node)
+    }
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in NON_DETERMINISTIC_NAMES:
+            return False
+        if isinstance(node, ast.Attribute) and node.attr in NON_DETERMINISTIC_NAMES and id(node) not in seeded:
+            return False
+        if isinstance(node, ast.Import) and any(a.name.split(".")[0] in NON_DETERMINISTIC_MODULES for a in node.names):
+            return False
+        if isinstance(node, ast.ImportFrom) and (node.module or "").split(".")[0] in NON_DETERMINISTIC_MODULES:
+            return False
+    return True
+
+
+def frame_identity(df):
+    """
+    Which frame the worker hands the code as `df`. The same file is the full pandas
+    frame in normal mode, but a sample of it in large dataset mode. A column
+    projection is fixed by the code and the columns, so it needs no identity of its own.
+    """
+    if not isinstance(df, LargeDataset):
+        return "pandas"
+    if df.is_sampled():
+        return f"large-sample-{LARGE_DATASET_MAX_ROWS}"
+    return "large"
+
+
+def code_cache_key(code, dataset_key, df):
+    """
+    Cache key for running `code` on a dataset: the code's syntax tree (so comments,
+    blank lines and formatting don't matter), the dataset's content hash and the
+    frame the code sees (see `frame_identity`).
+    None if the code can't be cached (doesn't parse, or isn't deterministic).
+    """
+    if not dataset_key:
+        return None
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    if not is_deterministic(tree):
+        return None
+
+    digest = hashlib.blake2b(ast.dump(tree).encode("utf-8"), digest_size=16).hexdigest()
+    return (dataset_key, frame_identity(df), digest)
+
+
+def _payload_bytes(payload):
+    size = len(payload["printed"].encode("utf-8")) + len(payload["figure_png"] or b"")
+    if payload["result"] is not None:
+        data = payload["result"]["data"]
+        size += len(data) if isinstance(data, bytes) else len(str(data).encode("utf-8"))
+    return size
+
+
+class CodeResultCache:
+    """LRU of successful worker payloads (printed output, serialised result, chart PNG) bounded by a byte budget."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (payload, size)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, payload):
+        # Failures are not cached: a timeout or a crashed worker may not happen again
+        if payload["error"] is not None:
+            return
+        size = _payload_bytes(payload)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            self._entries[key] = (payload, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+# Process-wide: shared by every Streamlit session
+code_cache = CodeResultCache(int(CODE_RESULT_CACHE_MB * 1024 * 1024))
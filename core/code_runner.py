@@ -1,22 +1,28 @@
 import streamlit as st
-import warnings
-import matplotlib.pyplot as plt
-import sys
-import io
-import pandas as pd
-
-def sanitize_value(value):
-    """Sanitize DataFrame/Series for Arrow compatibility."""
-    if isinstance(value, pd.Series):
-        return value.to_frame().astype(str)
-    if isinstance(value, pd.DataFrame):
-        return value.astype(str)
-    return value
-
-
-def execute_code_blocks(reply):
-    df = st.session_state.df
-
+from core.code_cache import code_cache, code_cache_key
+from core.progressive import BackgroundRun, get_sample, output_from_payload, wants_preview
+from core.scheduler import scheduler
+from core.state import current_session_id
+from core.tracing import span
+from core.ui_components import render_background_run, render_output
+from core.worker_pool import get_worker_pool
+from core.workspace import workspace_fingerprint
+
+
+def extract_code_blocks(text, complete=False):
+    """
+    Return the ```python blocks in `text` whose closing fence has arrived.
+    With `complete=True` a trailing unclosed block counts too (the reply is over).
+    """
+    blocks = []
+    for part in text.split("```python")[1:]:
+        if "```" not in part and not complete:
+            break
+        blocks.append(part.split("```")[0].strip())
+    return blocks
+
+
+def record_reply(reply, outputs):
     # If no python code is found, just store the assistant message
     if "```python" not in reply:
         st.session_state.messages.append({
@@ -25,111 +31,136 @@ def execute_code_blocks(reply):
         })
         return
 
-    code_blocks = reply.split("```python")
+    # Save assistant history message
+    for stored_output in outputs:
+        if stored_output is not None:
+            run = st.session_state.background_runs.get(stored_output.get("pending"))
+            if run is not None:
+                # Where the full-data run will put its result
+                run.message_index = len(st.session_state.messages)
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": reply,
+                "output": stored_output
+            })
+
 
-    for i in range(1, len(code_blocks)):
-        code = code_blocks[i].split("```")[0].strip()
-
-        try:
-            with warnings.catch_warnings(record=True) as w:
-                warnings.simplefilter("always")
-
-                # Prepare matplotlib
-                plt.figure(figsize=(10, 6))
-
-                # Prepare execution environment
-                exec_globals = {
-                    "df": df,
-                    "pd": __import__("pandas"),
-                    "plt": plt,
-                    "sns": __import__("seaborn"),
-                    "st": st
-                }
-                local_vars = {}
-
-                # ---- Capture print() output ----
-                stdout_buffer = io.StringIO()
-                sys_stdout_original = sys.stdout
-                sys.stdout = stdout_buffer
-
-                # Execute code
-                exec(code, exec_globals, local_vars)
-
-                # Restore stdout
-                sys.stdout = sys_stdout_original
-                printed_output = stdout_buffer.getvalue().strip()
-
-                # ---- Detect last expression value ----
-                last_line = code.split("\n")[-1].strip()
-
-                value_to_display = None
-
-                # Case 1: last line is a variable in globals
-                if last_line in exec_globals:
-                    value_to_display = exec_globals[last_line]
-
-                # Case 2: last line is a variable in locals
-                elif last_line in local_vars:
-                    value_to_display = local_vars[last_line]
-
-                # ---- Display outputs ----
-                # container to show all results together
-                output_box = st.container()
-
-                # Printed output
-                if printed_output:
-                    with output_box:
-                        st.write(printed_output)
-
-                # Main result (Series, DataFrame, number, etc.)
-                if value_to_display is not None:
-                    safe_value = sanitize_value(value_to_display)
-                    with output_box:
-                        st.write(safe_value)
-
-                # ---- Save result for chat persistence ----
-                stored_output = {
-                    "printed": printed_output,
-                    "result": sanitize_value(value_to_display) if value_to_display is not None else None,
-                    "figure": None
-                }
-
-                # ---- Plot handling ----
-                fig = plt.gcf()
-                if fig.get_axes():
-                    with output_box:
-                        st.pyplot(fig)
-
-                    stored_output["figure"] = fig
-
-                # Save assistant history message
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": reply,
-                    "output": stored_output
-                })
-
-                plt.close()
-
-                # ---- Show warnings ----
-                if w:
-                    for warning in w:
-                        st.info(f"Note: {warning.message}")
-
-        except Exception as e:
-            # Restore stdout in case of crash
-            sys.stdout = sys_stdout_original
-
-            st.error(f"Code execution failed: {type(e).__name__}")
-            st.code(code, language="python")
-
-            error_msg = str(e)
-
-            if "NameError" in error_msg:
-                st.info("Possibly a wrong column name.")
-            elif "TypeError" in error_msg:
-                st.info("Likely non-numeric data in a numeric operation.")
-            elif "KeyError" in error_msg:
-                st.info("The specified column does not exist in your dataset.")
-            else:
-                st.info("Try rephrasing your question.")
\ No newline at end of file
+def execute_code_blocks(reply):
+    outputs = [run_code_block(code) for code in extract_code_blocks(reply, complete=True)]
+    record_reply(reply, outputs)
+
+
+ERROR_HINTS = {
+    "NameError": "Possibly a wrong column name.",
+    "TypeError": "Likely non-numeric data in a numeric operation.",
+    "KeyError": "The specified column does not exist in your dataset.",
+    "TimeoutError": "Try a narrower question or fewer rows.",
+    "MemoryError": "Try selecting fewer columns or aggregating first.",
+    "WorkerCrashed": "Try rephrasing your question.",
+}
+
+
+def _dataset_ref(pool, key, df):
+    dataset_ref = pool.share_dataset(key, df)
+    if dataset_ref is not None and st.session_state.workspace_tables:
+        # Extra tables travel as Parquet paths; workers read them through `query()`
+        # (in place: the handle keeps the export alive while the job needs it)
+        dataset_ref["tables"] = {
+            name: table["dataset"].path for name, table in st.session_state.workspace_tables.items()
+        }
+    return dataset_ref
+
+
+def _run_job(pool, code, dataset_ref):
+    with span("code.execute") as code_span:
+        with scheduler.slot(current_session_id(), "code"):
+            job = pool.submit(code, dataset_ref)
+            try:
+                with st.spinner("Running code..."):
+                    payload = job.result()
+            finally:
+                # Script interrupted (Stop / rerun): don't leave the worker busy
+                if not job.done():
+                    job.cancel()
+
+        # Measured inside the worker; the rest of the span is queueing and transfer
+        for key, value in payload["timings"].items():
+            code_span.set(f"worker.{key}", value)
+        if payload["error"] is not None:
+            code_span.set("error.type", payload["error"]["type"])
+    return payload
+
+
+def run_code_block(code):
+    """Execute one block in a worker process, render its output and return it for chat persistence."""
+    # Same code on the same data (attached tables included) -> same output
+    cache_key = code_cache_key(code, workspace_fingerprint(), st.session_state.df)
+    if cache_key is not None:
+        with span("code.cache") as cache_span:
+            payload = code_cache.get(cache_key)
+            cache_span.set("cache_hit", payload is not None)
+        if payload is not None:
+            return _show_payload(code, payload)
+
+    pool = get_worker_pool()
+    df = st.session_state.df
+    full_ref = _dataset_ref(pool, st.session_state.dataset_hash, df)
+
+    if not (st.session_state.progressive_enabled and wants_preview(df, code)):
+        payload = _run_job(pool, code, full_ref)
+        if cache_key is not None:
+            code_cache.put(cache_key, payload)
+        return _show_payload(code, payload)
+
+    # Big frame: answer from the stratified sample first, then run on every row in the background
+    with span("code.sample"):
+        sample = get_sample(st.session_state.dataset_hash, df, st.session_state.data_profile)
+    sample_ref = _dataset_ref(pool, f"{st.session_state.dataset_hash}-sample", sample["frame"])
+    sampled = {"rows": len(sample["frame"]), "total": sample["total_rows"], "columns": sample["columns"]}
+
+    output = _show_payload(code, _run_job(pool, code, sample_ref), sampled=sampled)
+    if output is None:
+        # Failed (or cancelled) on the sample; it would fail on all rows too
+        return None
+
+    run = BackgroundRun(pool, code, full_ref, current_session_id(), sample["total_rows"], cache_key)
+    st.session_state.background_runs[run.id] = run
+    output["pending"] = run.id
+    render_background_run(run.id)
+    return output
+
+
+def _show_payload(code, payload, sampled=None):
+    error = payload["error"]
+    if error is not None:
+        if error["type"] == "CancelledError":
+            st.warning("Code execution was cancelled.")
+            return None
+
+        st.error(f"Code execution failed: {error['type']}")
+        st.code(code, language="python")
+        if error["type"] in ("TimeoutError", "MemoryError", "WorkerCrashed"):
+            st.caption(error["message"])
+        st.info(ERROR_HINTS.get(error["type"], "Try rephrasing your question."))
+        return None
+
+    for note in payload["notes"]:
+        st.info(note)
+
+    with span("result.decode"):
+        output = output_from_payload(payload, st.session_state.figure_store)
+    if sampled is not None:
+        output["sampled"] = sampled
+
+    with span("render"):
+        # ---- Display outputs ----
+        # container to show all results together
+        with st.container():
+            render_output(output)
+
+        # ---- Show warnings ----
+        for warning in payload["warnings"]:
+            st.info(f"Note: {warning}")
+
+    # ---- Save result for chat persistence ----
+    return output
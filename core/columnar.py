@@ -0,0 +1,89 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Upload extension -> how it is read
+FILE_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "ipc",
+    ".arrow": "ipc",
+    ".ipc": "ipc"
+}
+UPLOAD_TYPES = [ext.lstrip(".") for ext in FILE_FORMATS]
+
+
+def file_format(filename):
+    return FILE_FORMATS.get(os.path.splitext(filename)[1].lower(), "csv")
+
+
+def open_ipc(path, columns=None):
+    """Memory-map a Feather v2 / Arrow IPC file; uncompressed buffers are used in place."""
+    source = pa.memory_map(path)
+    try:
+        table = pa.ipc.open_file(source).read_all()
+    except pa.ArrowInvalid:
+        # Streaming format (no footer)
+        source.seek(0)
+        table = pa.ipc.open_stream(source).read_all()
+    return table.select(columns) if columns else table
+
+
+def read_arrow_table(path, fmt, columns=None):
+    if fmt == "parquet":
+        return pq.read_table(path, columns=columns, memory_map=True)
+    return open_ipc(path, columns)
+
+
+def ipc_to_parquet(path, parquet_path):
+    """Rewrite an IPC file as Parquet one record batch at a time (bounded memory)."""
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+    source = pa.memory_map(path)
+    try:
+        reader = pa.ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        batches = iter(reader)
+
+    with pq.ParquetWriter(parquet_path + ".tmp", reader.schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+    os.replace(parquet_path + ".tmp", parquet_path)
+
+
+def parquet_column_stats(path):
+    """
+    Row count and per-column null count / min / max from the Parquet footer.
+    Columns whose row groups don't all carry statistics are left out.
+    """
+    metadata = pq.ParquetFile(path).metadata
+
+    stats = {}
+    for i in range(metadata.num_columns):
+        name = metadata.schema.column(i).path
+        if "." in name:
+            continue  # nested leaf, not a top-level column
+
+        nulls, low, high = 0, None, None
+        for g in range(metadata.num_row_groups):
+            column_stats = metadata.row_group(g).column(i).statistics
+            if column_stats is None or not column_stats.has_null_count:
+                break
+            nulls += column_stats.null_count
+
+            if not column_stats.has_min_max:
+                # All-null row group: nothing to compare
+                if column_stats.null_count == metadata.row_group(g).num_rows:
+                    continue
+                break
+            low = column_stats.min if low is None else min(low, column_stats.min)
+            high = column_stats.max if high is None else max(high, column_stats.max)
+        else:
+            stats[name] = {"nulls": nulls, "min": low, "max": high}
+
+    return metadata.num_rows, stats
@@ -0,0 +1,132 @@
+import os
+
+# ---- Local cache directory (dataset snapshots, spool files, ...) ----
+CACHE_DIR = os.getenv("ASK_CSV_CACHE_DIR", ".cache")
+
+# ---- CSV ingestion ----
+INGEST_SAMPLE_ROWS = int(os.getenv("ASK_CSV_INGEST_SAMPLE_ROWS", "10000"))
+INGEST_CHUNK_ROWS = int(os.getenv("ASK_CSV_INGEST_CHUNK_ROWS", "250000"))
+
+# Text columns with unique/non-null ratio below this become categoricals
+CATEGORY_MAX_UNIQUE_RATIO = float(os.getenv("ASK_CSV_CATEGORY_MAX_UNIQUE_RATIO", "0.5"))
+
+# ---- Large dataset (out-of-core) mode ----
+# Uploads bigger than this default to DuckDB/Parquet-backed mode
+LARGE_DATASET_THRESHOLD_MB = float(os.getenv("ASK_CSV_LARGE_DATASET_THRESHOLD_MB", "200"))
+
+# Python mode never pulls more rows than this into pandas; larger data is sampled
+LARGE_DATASET_MAX_ROWS = int(os.getenv("ASK_CSV_LARGE_DATASET_MAX_ROWS", "1000000"))
+
+# ---- Shared dataset store (all sessions) ----
+# Loaded datasets no session uses any more are kept for reuse up to this budget
+DATASET_STORE_MB = float(os.getenv("ASK_CSV_DATASET_STORE_MB", "2048"))
+
+# ---- DuckDB connections ----
+# Per-session connections idle for longer than this are closed
+DUCKDB_IDLE_TTL_SECONDS = int(os.getenv("ASK_CSV_DUCKDB_IDLE_TTL_SECONDS", "1800"))
+DUCKDB_MAX_PREPARED_STATEMENTS = int(os.getenv("ASK_CSV_DUCKDB_MAX_PREPARED_STATEMENTS", "64"))
+
+# ---- Scheduler (shared by all sessions) ----
+# SQL queries, code blocks and profiling jobs running at once; the rest wait in a per-session fair queue
+SCHEDULER_SLOTS = int(os.getenv("ASK_CSV_SCHEDULER_SLOTS", "4"))
+
+
+def _half_ram_mb():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (2 * 1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return 4096
+
+
+# Machine budget, split evenly between the slots (DuckDB threads / memory_limit per connection)
+RESOURCE_THREADS = int(os.getenv("ASK_CSV_RESOURCE_THREADS", str(os.cpu_count() or 1)))
+RESOURCE_MEMORY_MB = int(os.getenv("ASK_CSV_RESOURCE_MEMORY_MB", str(_half_ram_mb())))
+
+# ---- SQL result cache (shared by all sessions) ----
+SQL_RESULT_CACHE_MB = float(os.getenv("ASK_CSV_SQL_RESULT_CACHE_MB", "256"))
+
+# ---- Code result cache (shared by all sessions) ----
+# Outputs of Python blocks, keyed by the code's syntax tree and the dataset hash
+CODE_RESULT_CACHE_MB = float(os.getenv("ASK_CSV_CODE_RESULT_CACHE_MB", "128"))
+
+# ---- SQL guardrails ----
+# Rows fetched from a query; larger results are cut off here (the full result can be exported)
+SQL_MAX_RESULT_ROWS = int(os.getenv("ASK_CSV_SQL_MAX_RESULT_ROWS", "10000"))
+# Queries whose planned output (EXPLAIN estimate) exceeds this are refused, e.g. accidental cross joins
+SQL_MAX_ESTIMATED_ROWS = int(os.getenv("ASK_CSV_SQL_MAX_ESTIMATED_ROWS", "1000000000"))
+SQL_EXPORT_DIR = os.getenv("ASK_CSV_SQL_EXPORT_DIR", os.path.join(CACHE_DIR, "exports"))
+
+# ---- SQL rollups ----
+# Categorical columns with at most this many values (up to ROLLUP_MAX_DIMENSIONS of them) are pre-aggregated
+ROLLUP_MAX_CARDINALITY = int(os.getenv("ASK_CSV_ROLLUP_MAX_CARDINALITY", "50"))
+ROLLUP_MAX_DIMENSIONS = int(os.getenv("ASK_CSV_ROLLUP_MAX_DIMENSIONS", "4"))
+# A rollup is only kept if it has at most this fraction of the table's rows
+ROLLUP_MAX_RATIO = float(os.getenv("ASK_CSV_ROLLUP_MAX_RATIO", "0.2"))
+
+# ---- LLM response cache ----
+LLM_CACHE_PATH = os.getenv("ASK_CSV_LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.sqlite"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("ASK_CSV_LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv("ASK_CSV_LLM_CACHE_MAX_MB", "50"))
+
+# ---- LLM transport (shared by all sessions) ----
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_TIMEOUT_SECONDS = float(os.getenv("ASK_CSV_LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("ASK_CSV_LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONCURRENCY = int(os.getenv("ASK_CSV_LLM_MAX_CONCURRENCY", "8"))
+LLM_REQUESTS_PER_SECOND = float(os.getenv("ASK_CSV_LLM_REQUESTS_PER_SECOND", "5"))
+# Send a duplicate request when the first hasn't answered after this long (0 = off)
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("ASK_CSV_LLM_HEDGE_AFTER_SECONDS", "0"))
+
+# ---- Profiling ----
+# "head" profiles sample values/date detection from the first rows, "random" from a reservoir sample
+PROFILE_SAMPLE_MODE = os.getenv("ASK_CSV_PROFILE_SAMPLE_MODE", "head")
+PROFILE_SAMPLE_ROWS = int(os.getenv("ASK_CSV_PROFILE_SAMPLE_ROWS", "1000"))
+
+# ---- Generated code execution (worker processes) ----
+CODE_WORKERS = int(os.getenv("ASK_CSV_CODE_WORKERS", "2"))
+CODE_TIMEOUT_SECONDS = float(os.getenv("ASK_CSV_CODE_TIMEOUT_SECONDS", "60"))
+CODE_MEMORY_LIMIT_MB = float(os.getenv("ASK_CSV_CODE_MEMORY_LIMIT_MB", "2048"))
+# Where datasets are shared with workers as Arrow IPC files (RAM-backed when possible)
+SHARED_DATASET_DIR = os.getenv(
+    "ASK_CSV_SHARED_DATASET_DIR",
+    "/dev/shm/ask_csv" if os.path.isdir("/dev/shm") else os.path.join(CACHE_DIR, "shared")
+)
+
+# ---- Progressive execution (Python mode) ----
+# Code over frames with at least this many rows first runs on a stratified sample, then on all rows
+PROGRESSIVE_MIN_ROWS = int(os.getenv("ASK_CSV_PROGRESSIVE_MIN_ROWS", "200000"))
+PROGRESSIVE_SAMPLE_ROWS = int(os.getenv("ASK_CSV_PROGRESSIVE_SAMPLE_ROWS", "20000"))
+
+# ---- Result rendering ----
+# Rows per page when showing tabular results (also the Parquet row group size in history)
+RESULT_PAGE_ROWS = int(os.getenv("ASK_CSV_RESULT_PAGE_ROWS", "200"))
+
+# ---- Chart history ----
+FIGURE_DPI = int(os.getenv("ASK_CSV_FIGURE_DPI", "100"))
+# Per-session budget for chart PNGs kept in memory; older charts spill to CACHE_DIR/figures
+FIGURE_STORE_MB = float(os.getenv("ASK_CSV_FIGURE_STORE_MB", "32"))
+
+# ---- Report export ----
+# Rows of each stored table and characters of printed output that go into the HTML report
+REPORT_TABLE_ROWS = int(os.getenv("ASK_CSV_REPORT_TABLE_ROWS", "50"))
+REPORT_TEXT_CHARS = int(os.getenv("ASK_CSV_REPORT_TEXT_CHARS", "20000"))
+REPORT_DIR = os.path.join(CACHE_DIR, "reports")
+
+# ---- Prompt context ----
+# Token budget for the dataset digest sent with every question (Python and SQL prompts)
+PROMPT_CONTEXT_TOKENS = int(os.getenv("ASK_CSV_PROMPT_CONTEXT_TOKENS", "1500"))
+
+# ---- Conversation store ----
+CONVERSATION_DB_PATH = os.getenv("ASK_CSV_CONVERSATION_DB_PATH", os.path.join(CACHE_DIR, "conversations.sqlite"))
+# Most recent messages kept in memory; older ones are paged in from SQLite when needed
+CONVERSATION_MEMORY_WINDOW = int(os.getenv("ASK_CSV_CONVERSATION_MEMORY_WINDOW", "20"))
+CONVERSATION_PAGE_SIZE = int(os.getenv("ASK_CSV_CONVERSATION_PAGE_SIZE", "20"))
+# Rows left behind by sessions that never closed cleanly (server killed) are dropped after this long unused
+CONVERSATION_RETENTION_SECONDS = int(os.getenv("ASK_CSV_CONVERSATION_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# ---- Tracing ----
+# Append every finished trace to this file ("" = off); format "jsonl" or "otlp" (OTLP/JSON lines)
+TRACE_EXPORT_PATH = os.getenv("ASK_CSV_TRACE_EXPORT_PATH", "")
+TRACE_EXPORT_FORMAT = os.getenv("ASK_CSV_TRACE_EXPORT_FORMAT", "jsonl")
+# Traces kept per session for the performance panel
+TRACE_HISTORY = int(os.getenv("ASK_CSV_TRACE_HISTORY", "20"))
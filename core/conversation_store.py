@@ -0,0 +1,256 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+
+from core.config import (
+    CONVERSATION_DB_PATH,
+    CONVERSATION_MEMORY_WINDOW,
+    CONVERSATION_PAGE_SIZE,
+    CONVERSATION_RETENTION_SECONDS
+)
+
+# Older pages kept in memory after being read back
+MAX_CACHED_PAGES = 2
+# How often a session's last-seen time is written back while it is in use
+TOUCH_INTERVAL_SECONDS = 300
+# Shown in place of a message whose row is gone (e.g. deleted by hand)
+MISSING_MESSAGE = {"role": "assistant", "content": "_This message is no longer available._"}
+
+# Sessions of this process that are still open; retention never touches them
+_live_sessions = set()
+_live_lock = threading.Lock()
+
+
+def _connect(path):
+    # One short-lived connection per call keeps this safe across session threads
+    return sqlite3.connect(path, timeout=10)
+
+
+def _drop_session(path, session):
+    try:
+        with _connect(path) as con:
+            con.execute("DELETE FROM messages WHERE session = ?", (session,))
+            con.execute("DELETE FROM sessions WHERE session = ?", (session,))
+    except sqlite3.Error:
+        pass
+
+
+def _end_session(path, session):
+    with _live_lock:
+        _live_sessions.discard(session)
+    _drop_session(path, session)
+
+
+def _expire_sessions(con):
+    """Drop sessions nobody has used for CONVERSATION_RETENTION_SECONDS, except ones open here."""
+    cutoff = time.time() - CONVERSATION_RETENTION_SECONDS
+    expired = {row[0] for row in con.execute("SELECT session FROM sessions WHERE last_seen < ?", (cutoff,))}
+    # Rows written before sessions were tracked only have their creation time
+    expired |= {
+        row[0] for row in con.execute(
+            "SELECT DISTINCT session FROM messages WHERE created < ? "
+            "AND session NOT IN (SELECT session FROM sessions)", (cutoff,)
+        )
+    }
+    with _live_lock:
+        expired -= _live_sessions
+
+    con.executemany("DELETE FROM messages WHERE session = ?", [(session,) for session in expired])
+    con.executemany("DELETE FROM sessions WHERE session = ?", [(session,) for session in expired])
+
+
+class ConversationStore:
+    """
+    Chat history for one session, usable wherever the plain message list was
+    (append, len, iteration, indexing and slicing).
+
+    Every message is written to SQLite; only the most recent window stays in
+    memory, and older turns are read back a page at a time when the history
+    or the report export walks them. Rows are deleted when the session ends;
+    rows of sessions that ended without cleanup (server killed) expire once
+    they haven't been used for CONVERSATION_RETENTION_SECONDS.
+    """
+
+    def __init__(self, path=CONVERSATION_DB_PATH, window=CONVERSATION_MEMORY_WINDOW,
+                 page_size=CONVERSATION_PAGE_SIZE):
+        self.path = path
+        self.window = window
+        self.page_size = page_size
+        self.session = uuid.uuid4().hex
+
+        self._count = 0
+        self._recent = OrderedDict()  # seq -> message
+        self._pages = OrderedDict()   # page number -> {seq: message}
+        self._sizes = {}              # seq -> pickled size of in-memory messages
+        self._edits = {}              # seq -> times the message was replaced
+        self._generation = 0          # bumped by clear(), so old seqs never look current
+        self._touched = 0.0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with _connect(path) as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " session TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " data BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " PRIMARY KEY (session, seq))"
+            )
+            con.execute("CREATE TABLE IF NOT EXISTS sessions (session TEXT PRIMARY KEY, last_seen REAL NOT NULL)")
+            _expire_sessions(con)
+
+        with _live_lock:
+            _live_sessions.add(self.session)
+        weakref.finalize(self, _end_session, path, self.session)
+        self._touch()
+
+    def _touch(self):
+        """Record that the session is in use (at most every TOUCH_INTERVAL_SECONDS)."""
+        now = time.time()
+        if now - self._touched < TOUCH_INTERVAL_SECONDS:
+            return
+        self._touched = now
+        try:
+            with _connect(self.path) as con:
+                con.execute(
+                    "INSERT INTO sessions (session, last_seen) VALUES (?, ?) "
+                    "ON CONFLICT (session) DO UPDATE SET last_seen = excluded.last_seen",
+                    (self.session, now)
+                )
+        except sqlite3.Error:
+            pass
+
+    # ---- list interface ----
+
+    def append(self, message):
+        data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            seq = self._count
+            with _connect(self.path) as con:
+                con.execute(
+                    "INSERT INTO messages (session, seq, data, size, created) VALUES (?, ?, ?, ?, ?)",
+                    (self.session, seq, data, len(data), time.time())
+                )
+            self._count += 1
+
+            self._recent[seq] = message
+            self._sizes[seq] = len(data)
+            while len(self._recent) > self.window:
+                old, _ = self._recent.popitem(last=False)
+                self._sizes.pop(old, None)
+
+    def __len__(self):
+        self._touch()
+        return self._count
+
+    def __iter__(self):
+        for seq in range(self._count):
+            yield self._get(seq)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(seq) for seq in range(*index.indices(self._count))]
+
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("conversation index out of range")
+        return self._get(index)
+
+    def __setitem__(self, index, message):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("conversation index out of range")
+
+        data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            with _connect(self.path) as con:
+                con.execute(
+                    "UPDATE messages SET data = ?, size = ? WHERE session = ? AND seq = ?",
+                    (data, len(data), self.session, index)
+                )
+
+            self._edits[index] = self._edits.get(index, 0) + 1
+
+            # Keep any in-memory copy in step with the row
+            for held in [self._recent, *self._pages.values()]:
+                if index in held:
+                    held[index] = message
+                    self._sizes[index] = len(data)
+
+    def clear(self):
+        with self._lock:
+            _drop_session(self.path, self.session)
+            self._count = 0
+            self._recent.clear()
+            self._pages.clear()
+            self._sizes.clear()
+            self._edits.clear()
+            self._generation += 1
+
+    def version(self, seq):
+        """Changes whenever the message at `seq` does; lets derived output be cached per message."""
+        return self._generation, self._edits.get(seq, 0)
+
+    # ---- paging ----
+
+    def _get(self, seq):
+        with self._lock:
+            if seq in self._recent:
+                return self._recent[seq]
+
+            number = seq // self.page_size
+            if number not in self._pages:
+                self._pages[number] = self._read_page(number)
+                while len(self._pages) > MAX_CACHED_PAGES:
+                    _, evicted = self._pages.popitem(last=False)
+                    for old in evicted:
+                        if old not in self._recent:
+                            self._sizes.pop(old, None)
+            self._pages.move_to_end(number)
+            return self._pages[number].get(seq, MISSING_MESSAGE)
+
+    def _read_page(self, number):
+        start = number * self.page_size
+        with _connect(self.path) as con:
+            rows = con.execute(
+                "SELECT seq, data FROM messages WHERE session = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (self.session, start, start + self.page_size)
+            ).fetchall()
+
+        page = {}
+        for seq, data in rows:
+            page[seq] = pickle.loads(data)
+            self._sizes[seq] = len(data)
+        return page
+
+    # ---- accounting ----
+
+    def stats(self):
+        with self._lock:
+            in_memory = set(self._recent)
+            for page in self._pages.values():
+                in_memory.update(page)
+
+            with _connect(self.path) as con:
+                disk_bytes = con.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM messages WHERE session = ?", (self.session,)
+                ).fetchone()[0]
+
+            return {
+                "messages": self._count,
+                "in_memory": len(in_memory),
+                "memory_bytes": sum(self._sizes.get(seq, 0) for seq in in_memory),
+                "disk_bytes": disk_bytes
+            }
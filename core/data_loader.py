@@ -1,27 +1,239 @@
+import os
+import time
 import streamlit as st
-import pandas as pd
-from core.profiler import profile_dataframe
+from core.config import LARGE_DATASET_THRESHOLD_MB
+from core.profiler import profile_dataframe, profile_large_dataset, summarize_frame
+from core.duckdb_utils import connect, summarize_relation
+from core.columnar import UPLOAD_TYPES, file_format, ipc_to_parquet, parquet_column_stats
+from core.ingest import read_csv_lean, read_columnar
+from core.large_dataset import (
+    SPOOL_DIR,
+    LargeDataset,
+    spool_upload,
+    spool_to_parquet,
+    build_large_summary
+)
+from core.dataset_store import dataset_store
+from core.scheduler import scheduler
+from core.state import current_session_id
+from core.tracing import span, trace
+from core.workspace import PRIMARY_TABLE, table_name_for
+from core.dataset_cache import (
+    content_hash,
+    build_data_summary,
+    load_snapshot,
+    save_snapshot,
+    snapshot_paths
+)
+
+
+def load_large_dataset(uploaded_file, file_hash):
+    started = time.perf_counter()
+    key = f"{file_hash}-large"
+    snapshot = load_snapshot(key, read_frame=LargeDataset)
+
+    if snapshot is not None:
+        dataset, summary, profile = snapshot
+        source = "snapshot"
+    else:
+        parquet_path = snapshot_paths(key)["frame"]
+        fmt = file_format(uploaded_file.name)
+
+        with span("ingest.parse", format=fmt, mode="large"):
+            if fmt == "parquet":
+                # Already columnar: DuckDB queries the uploaded file as it is
+                spool_upload(uploaded_file, parquet_path)
+            elif fmt == "ipc":
+                spool_path = os.path.join(SPOOL_DIR, f"{file_hash}.arrow")
+                spool_upload(uploaded_file, spool_path)
+                try:
+                    ipc_to_parquet(spool_path, parquet_path)
+                finally:
+                    os.remove(spool_path)
+            else:
+                spool_to_parquet(uploaded_file, parquet_path)
+
+            dataset = LargeDataset(parquet_path)
+
+        with span("ingest.profile"), scheduler.slot(current_session_id(), "profile"):
+            con = connect()
+            try:
+                # Row counts, nulls and min/max straight from the Parquet footer
+                summary_stats = summarize_relation(con, dataset.relation, known=parquet_column_stats(parquet_path))
+            finally:
+                con.close()
+
+            summary = build_large_summary(dataset, summary_stats)
+            profile = profile_large_dataset(dataset, summary_stats)
+
+        with span("ingest.snapshot"):
+            save_snapshot(key, None, summary, profile)
+        source = "large" if fmt == "csv" else f"{fmt}-large"
+
+    ingest_stats = {
+        "source": source,
+        "rows": dataset.row_count,
+        "parse_seconds": round(time.perf_counter() - started, 3),
+        "peak_memory_bytes": None,
+        "final_memory_bytes": 0,
+        "disk_bytes": os.path.getsize(dataset.path)
+    }
+
+    return dataset, summary, profile, ingest_stats
+
+
+def load_frame_dataset(uploaded_file, file_hash):
+    started = time.perf_counter()
+    snapshot = load_snapshot(file_hash)
+
+    if snapshot is not None:
+        df, summary, profile = snapshot
+        final_bytes = int(df.memory_usage(deep=True).sum())
+        ingest_stats = {
+            "source": "snapshot",
+            "rows": len(df),
+            "parse_seconds": round(time.perf_counter() - started, 3),
+            "peak_memory_bytes": final_bytes,
+            "final_memory_bytes": final_bytes
+        }
+    else:
+        fmt = file_format(uploaded_file.name)
+        with span("ingest.parse", format=fmt, mode="pandas"):
+            if fmt != "csv":
+                spool_path = os.path.join(SPOOL_DIR, file_hash + os.path.splitext(uploaded_file.name)[1].lower())
+                spool_upload(uploaded_file, spool_path)
+                try:
+                    df, ingest_stats = read_columnar(spool_path, fmt)
+                finally:
+                    os.remove(spool_path)
+            else:
+                df, ingest_stats = read_csv_lean(uploaded_file)
+
+        with span("ingest.profile"), scheduler.slot(current_session_id(), "profile"):
+            # One batched pass feeds both the prompt summary and the profile
+            summary_stats = summarize_frame(df)
+            summary = build_data_summary(df, summary_stats)
+
+            # NEW: auto profiling
+            profile = profile_dataframe(df, summary_stats)
+
+        with span("ingest.snapshot"):
+            save_snapshot(file_hash, df, summary, profile)
+
+    return df, summary, profile, ingest_stats
+
+
+def _acquire_shared(uploaded_file, file_hash, large):
+    """Reference the process-wide copy of this upload, loading it only if no session has it."""
+    started = time.perf_counter()
+    loaded = []
+
+    def load():
+        loaded.append(True)
+        if large:
+            return load_large_dataset(uploaded_file, file_hash)
+        return load_frame_dataset(uploaded_file, file_hash)
+
+    ref = dataset_store.acquire(f"{file_hash}-large" if large else file_hash, load)
+    ingest_stats = ref.entry.ingest_stats
+    if not loaded:
+        ingest_stats = dict(
+            ingest_stats,
+            source="shared",
+            parse_seconds=round(time.perf_counter() - started, 3),
+            peak_memory_bytes=None
+        )
+    return ref, ingest_stats
+
+
+def load_dataset(uploaded_file, file_hash, large=False):
+    ref, ingest_stats = _acquire_shared(uploaded_file, file_hash, large)
+    _store_dataset(ref, file_hash, ingest_stats, large)
+
+
+def load_workspace_tables(uploaded_files):
+    """Attach extra uploads as on-disk Parquet tables, named after their files."""
+    tables = {}
+    taken = {PRIMARY_TABLE}
+    for uploaded_file in uploaded_files:
+        file_hash = content_hash(uploaded_file)
+        ref, _ = _acquire_shared(uploaded_file, file_hash, large=True)
+
+        name = table_name_for(uploaded_file.name, taken)
+        taken.add(name)
+        tables[name] = {
+            "file": uploaded_file.name,
+            "hash": file_hash,
+            "dataset": ref.entry.df,
+            "summary": ref.entry.summary,
+            "profile": ref.entry.profile,
+            "ref": ref
+        }
+    return tables
+
+
+def _store_dataset(ref, file_hash, ingest_stats, large):
+    if st.session_state.dataset_ref is not None:
+        st.session_state.dataset_ref.release()
+
+    # The session only points at the shared copy; nothing here may modify it in place
+    st.session_state.dataset_ref = ref
+    st.session_state.df = ref.entry.df
+    st.session_state.data_summary = ref.entry.summary
+    st.session_state.data_profile = ref.entry.profile
+    st.session_state.dataset_hash = file_hash
+    st.session_state.ingest_stats = ingest_stats
+    st.session_state.large_dataset_mode = large
+
+
+def _store_workspace_tables(tables):
+    # New refs are taken first, so tables kept across the change stay loaded
+    for table in st.session_state.workspace_tables.values():
+        table["ref"].release()
+    st.session_state.workspace_tables = tables
+
 
 def sidebar_file_upload():
     with st.sidebar:
         st.header("📁 Data Upload")
-        uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
+        uploaded_files = st.file_uploader(
+            "Upload data files",
+            type=UPLOAD_TYPES,
+            accept_multiple_files=True,
+            help="The first file is the main dataset (`df`). Further files are "
+                 "attached as extra SQL tables named after the file."
+        )
+        uploaded_file = uploaded_files[0] if uploaded_files else None
 
         if uploaded_file:
+            large = st.checkbox(
+                "Large dataset mode (out-of-core)",
+                value=uploaded_file.size > LARGE_DATASET_THRESHOLD_MB * 1024 * 1024,
+                help="Keep the data on disk as Parquet and query it through DuckDB "
+                     "instead of loading it into pandas"
+            )
+
             try:
-                df = pd.read_csv(uploaded_file)
-                st.session_state.df = df
+                # Same upload as the last rerun -> nothing to hash or parse
+                if st.session_state.dataset_file_id != uploaded_file.file_id \
+                        or st.session_state.large_dataset_mode != large:
+                    file_hash = content_hash(uploaded_file)
+
+                    if st.session_state.dataset_hash != file_hash \
+                            or st.session_state.large_dataset_mode != large:
+                        with trace("upload", sink=st.session_state.traces, file=uploaded_file.name, large=large):
+                            load_dataset(uploaded_file, file_hash, large)
 
-                st.session_state.data_summary = {
-                    "shape": df.shape,
-                    "columns": df.columns.tolist(),
-                    "dtypes": df.dtypes.to_dict(),
-                    "sample": df.head(3).to_dict(),
-                    "stats": df.describe().to_dict() if not df.empty else {}
-                }
+                    st.session_state.dataset_file_id = uploaded_file.file_id
 
-                # NEW: auto profiling
-                st.session_state.data_profile = profile_dataframe(df)
+                extra_files = uploaded_files[1:]
+                file_ids = tuple(f.file_id for f in extra_files)
+                if st.session_state.workspace_file_ids != file_ids:
+                    _store_workspace_tables(load_workspace_tables(extra_files))
+                    st.session_state.workspace_file_ids = file_ids
+
+                df = st.session_state.df
+                ingest_stats = st.session_state.ingest_stats
 
                 st.success(f"✅ Loaded {df.shape[0]} rows × {df.shape[1]} columns")
 
@@ -35,12 +247,42 @@ def sidebar_file_upload():
                         st.metric("Total Columns", df.shape[1])
 
                     with col2:
-                        st.metric("Memory Usage", f"{df.memory_usage().sum() / 1024:.1f} KB")
-                        st.metric("Missing Values", df.isnull().sum().sum())
+                        if large:
+                            st.metric("On Disk", f"{ingest_stats['disk_bytes'] / 1024:.1f} KB")
+                        else:
+                            st.metric("Memory Usage", f"{ingest_stats['final_memory_bytes'] / 1024:.1f} KB")
+                        st.metric("Missing Values", st.session_state.data_summary["missing_values"])
+
+                    source = {
+                        "snapshot": "Parquet snapshot",
+                        "shared": "an already loaded copy (shared between sessions)",
+                        "large": "CSV → Parquet (DuckDB)",
+                        "parquet": "Parquet (memory-mapped)",
+                        "ipc": "Arrow IPC (memory-mapped)",
+                        "parquet-large": "Parquet, queried in place (DuckDB)",
+                        "ipc-large": "Arrow IPC → Parquet"
+                    }.get(ingest_stats["source"], "CSV")
+                    caption = f"Parsed from {source} in {ingest_stats['parse_seconds']:.2f}s"
+                    if ingest_stats["peak_memory_bytes"] is not None:
+                        caption += f" · estimated peak memory {ingest_stats['peak_memory_bytes'] / 1024:.1f} KB"
+                    st.caption(caption)
+
+                    if large and df.is_sampled():
+                        st.caption(
+                            "Python mode works on a row sample of this dataset; "
+                            "SQL mode queries the full file."
+                        )
+
+                if st.session_state.workspace_tables:
+                    with st.expander("Workspace Tables"):
+                        st.caption("Kept on disk as Parquet and queried through DuckDB; join them with `df` in SQL.")
+                        for name, table in st.session_state.workspace_tables.items():
+                            rows, columns = table["dataset"].shape
+                            st.markdown(f"`{name}` ← {table['file']} ({rows:,} rows × {columns} columns)")
 
             except Exception as e:
                 st.error(f"Error reading file: {str(e)}")
-                st.info("Please make sure your file is a valid CSV format.")
+                st.info("Please make sure your file is a valid CSV, Parquet, Feather or Arrow IPC file.")
 
         else:
-            st.info("👆 Upload a CSV file to start analyzing!")
\ No newline at end of file
+            st.info("👆 Upload a CSV, Parquet or Arrow file to start analyzing!")
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import pickle
+
+import pandas as pd
+
+from core.config import CACHE_DIR
+from core.duckdb_utils import describe_from_summary, missing_from_summary
+
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "datasets")
+
+
+def content_hash(uploaded_file, chunk_size=1 << 20):
+    """Hash the uploaded bytes without copying the whole file."""
+    hasher = hashlib.blake2b(digest_size=16)
+    uploaded_file.seek(0)
+    while True:
+        chunk = uploaded_file.read(chunk_size)
+        if not chunk:
+            break
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    return hasher.hexdigest()
+
+
+def build_data_summary(df: pd.DataFrame, summary_stats: pd.DataFrame):
+    """Prompt summary; stats come from the profiler's single pass, not `describe()`."""
+    return {
+        "shape": df.shape,
+        "columns": df.columns.tolist(),
+        "dtypes": df.dtypes.to_dict(),
+        "sample": df.head(3).to_dict(),
+        "stats": describe_from_summary(summary_stats) if not df.empty else {},
+        "missing_values": missing_from_summary(summary_stats)
+    }
+
+
+def snapshot_paths(key):
+    folder = os.path.join(SNAPSHOT_DIR, key)
+    return {
+        "folder": folder,
+        "frame": os.path.join(folder, "frame.parquet"),
+        "profile": os.path.join(folder, "profile.parquet"),
+        "summary": os.path.join(folder, "summary.pkl")
+    }
+
+
+def load_snapshot(key, read_frame=pd.read_parquet):
+    paths = snapshot_paths(key)
+    if not all(os.path.exists(paths[p]) for p in ("frame", "profile", "summary")):
+        return None
+
+    try:
+        df = read_frame(paths["frame"])
+        profile = pd.read_parquet(paths["profile"])
+        with open(paths["summary"], "rb") as f:
+            summary = pickle.load(f)
+    except Exception:
+        # A half-written or incompatible snapshot is treated as a miss
+        return None
+
+    return df, summary, profile
+
+
+def save_snapshot(key, df, summary, profile):
+    paths = snapshot_paths(key)
+    os.makedirs(paths["folder"], exist_ok=True)
+
+    # `df=None` means the frame Parquet is already in place (large dataset mode)
+    written = ["profile", "summary"] if df is None else ["frame", "profile", "summary"]
+
+    # Write to temp files first so a crash never leaves a partial snapshot
+    try:
+        if df is not None:
+            df.to_parquet(paths["frame"] + ".tmp", index=False)
+        profile.to_parquet(paths["profile"] + ".tmp", index=False)
+        with open(paths["summary"] + ".tmp", "wb") as f:
+            pickle.dump(summary, f)
+    except Exception:
+        # Columns pyarrow can't encode (e.g. mixed object types) -> skip snapshot
+        for p in written:
+            if os.path.exists(paths[p] + ".tmp"):
+                os.remove(paths[p] + ".tmp")
+        return False
+
+    for p in written:
+        os.replace(paths[p] + ".tmp", paths[p])
+
+    return True
@@ -0,0 +1,130 @@
+import threading
+import weakref
+from collections import OrderedDict, deque
+
+import pandas as pd
+
+from core.config import DATASET_STORE_MB
+
+
+class DatasetEntry:
+    """One loaded dataset with its prompt summary, profile and ingest stats, shared read-only."""
+
+    def __init__(self, key, df, summary, profile, ingest_stats):
+        self.key = key
+        self.df = df
+        self.summary = summary
+        self.profile = profile
+        self.ingest_stats = ingest_stats
+        self.refs = 0
+
+        # Out-of-core datasets are a handle on a Parquet file; only pandas frames cost RAM
+        frame_bytes = int(df.memory_usage(deep=True).sum()) if isinstance(df, pd.DataFrame) else 0
+        self.nbytes = frame_bytes + int(profile.memory_usage(deep=True).sum())
+
+
+class DatasetRef:
+    """A session's hold on a shared dataset; released explicitly or when the session goes away."""
+
+    def __init__(self, store, entry):
+        self.entry = entry
+        self._release = weakref.finalize(self, store._release, entry)
+
+    def release(self):
+        self._release()
+
+
+class DatasetStore:
+    """
+    Process-wide datasets keyed by content hash, so sessions uploading the same
+    file share one copy. Entries nobody references are kept for reuse until the
+    memory budget is exceeded, then dropped least recently used first.
+    """
+
+    def __init__(self, max_bytes=int(DATASET_STORE_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._released = deque()  # entries whose refs are gone, not yet counted down
+        self._lock = threading.Lock()
+
+    def acquire(self, key, load):
+        """
+        Reference the dataset stored under `key`; `load()` -> (df, summary, profile, ingest_stats)
+        runs only if no session has it, and only once when several ask at the same time.
+        """
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                self._drain_released()
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    entry.refs += 1
+                    return DatasetRef(self, entry)
+
+            entry = DatasetEntry(key, *load())
+
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = entry
+                self.current_bytes += entry.nbytes
+                entry.refs += 1
+                self._drain_released()
+                return DatasetRef(self, entry)
+
+    def _release(self, entry):
+        # Runs from weakref finalizers, i.e. whenever GC strikes -- possibly in a thread
+        # already holding the lock inside acquire(). So never block: queue the release,
+        # and count it down now only if the lock is free (otherwise its holder will)
+        self._released.append(entry)
+        if self._lock.acquire(blocking=False):
+            try:
+                self._drain_released()
+            finally:
+                self._lock.release()
+
+    def _drain_released(self):
+        while self._released:
+            self._released.popleft().refs -= 1
+        self._evict()
+
+    def clear(self):
+        """Forget every entry; sessions keep the copies they hold."""
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+            self.current_bytes = 0
+
+    def _evict(self):
+        # Datasets some session still uses are never dropped, even over budget
+        for key in list(self._entries):
+            if self.current_bytes <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.refs <= 0:
+                del self._entries[key]
+                self._loading.pop(key, None)
+                self.current_bytes -= entry.nbytes
+
+    def stats(self):
+        with self._lock:
+            self._drain_released()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "referenced": sum(1 for entry in self._entries.values() if entry.refs > 0),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+# Process-wide: shared by every Streamlit session
+dataset_store = DatasetStore()
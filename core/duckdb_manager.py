@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+
+import duckdb
+
+from core.config import DUCKDB_IDLE_TTL_SECONDS, DUCKDB_MAX_PREPARED_STATEMENTS
+from core.duckdb_utils import connect, quote_identifier
+from core.large_dataset import LargeDataset
+
+
+class SessionConnection:
+    """
+    One DuckDB connection with the session's dataset loaded as table `df`
+    and any extra workspace files attached as views over their Parquet.
+    """
+
+    def __init__(self, fingerprint, dataset, tables=None):
+        self.fingerprint = fingerprint
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        self.con = connect()
+        self._statements = OrderedDict()
+        self._next_statement = 0
+        # Pre-aggregated rollup of `df` (see core/rollup.py); built in the background
+        self.rollup = None
+        self.rollup_status = None
+
+        if isinstance(dataset, LargeDataset):
+            # Data stays in the Parquet file; DuckDB reads only what each query touches
+            self.con.execute(f"CREATE VIEW df AS SELECT * FROM {dataset.relation}")
+        else:
+            # Copy once into native (compressed, columnar) DuckDB storage
+            self.con.register("df_source", dataset)
+            self.con.execute("CREATE TABLE df AS SELECT * FROM df_source")
+            self.con.unregister("df_source")
+
+        # Views only: nothing is read until a query touches the table
+        for name, table in (tables or {}).items():
+            self.con.execute(f"CREATE VIEW {quote_identifier(name)} AS SELECT * FROM {table.relation}")
+
+    def _prepared_name(self, sql):
+        name = self._statements.get(sql)
+        if name is not None:
+            self._statements.move_to_end(sql)
+            return name
+
+        name = f"q{self._next_statement}"
+        self._next_statement += 1
+        self.con.execute(f"PREPARE {name} AS {sql}")
+        self._statements[sql] = name
+
+        if len(self._statements) > DUCKDB_MAX_PREPARED_STATEMENTS:
+            _, evicted = self._statements.popitem(last=False)
+            self.con.execute(f"DEALLOCATE {evicted}")
+
+        return name
+
+    def execute(self, sql):
+        """Run `sql` through a cached prepared statement; returns the DuckDB result."""
+        self.last_used = time.monotonic()
+        sql = sql.strip().rstrip(";")
+
+        try:
+            name = self._prepared_name(sql)
+        except duckdb.Error:
+            # Not preparable (several statements, or simply invalid) -> run as-is,
+            # so any error message refers to the user's SQL, not the PREPARE
+            return self.con.execute(sql)
+
+        return self.con.execute(f"EXECUTE {name}")
+
+    def close(self):
+        self.con.close()
+
+
+class ConnectionManager:
+    """
+    Keeps one DuckDB connection per (session, dataset fingerprint).
+    Connections are built outside the manager's lock, so loading one
+    session's table never holds up the others; idle ones are swept on a timer.
+    """
+
+    def __init__(self, idle_ttl=DUCKDB_IDLE_TTL_SECONDS):
+        self.idle_ttl = idle_ttl
+        self._connections = {}
+        self._building = {}  # session -> Event set once its connection is built (or failed)
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def get(self, session_id, fingerprint, dataset, tables=None):
+        self.close_idle()
+        self._start_sweeper()
+
+        while True:
+            stale = None
+            with self._lock:
+                conn = self._connections.get(session_id)
+                if conn is not None and conn.fingerprint != fingerprint:
+                    # Dataset changed -> the old table is useless
+                    stale = self._connections.pop(session_id)
+                    conn = None
+
+                if conn is not None:
+                    conn.last_used = time.monotonic()
+                    return conn
+
+                building = self._building.get(session_id)
+                owner = building is None
+                if owner:
+                    building = self._building[session_id] = threading.Event()
+
+            if stale is not None:
+                stale.close()
+
+            if not owner:
+                # Another thread of this session is loading; use its connection once ready
+                building.wait()
+                continue
+
+            try:
+                conn = SessionConnection(fingerprint, dataset, tables)
+                with self._lock:
+                    self._connections[session_id] = conn
+                return conn
+            finally:
+                with self._lock:
+                    self._building.pop(session_id, None)
+                building.set()
+
+    def peek(self, session_id):
+        """The session's open connection, if any (never creates one)."""
+        self.close_idle()
+        with self._lock:
+            return self._connections.get(session_id)
+
+    def close(self, session_id):
+        with self._lock:
+            conn = self._connections.pop(session_id, None)
+        if conn is not None:
+            conn.close()
+
+    def close_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                sid for sid, conn in self._connections.items()
+                if now - conn.last_used > self.idle_ttl and not conn.lock.locked()
+            ]
+            closed = [self._connections.pop(sid) for sid in expired]
+
+        for conn in closed:
+            conn.close()
+
+    def _start_sweeper(self):
+        # Idle connections are freed even when no new query arrives to trigger the sweep
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep, name="duckdb-idle-sweep", daemon=True)
+        self._sweeper.start()
+
+    def _sweep(self):
+        while True:
+            time.sleep(max(1.0, self.idle_ttl / 4))
+            self.close_idle()
+
+    def __len__(self):
+        return len(self._connections)
+
+
+# Process-wide: shared by every Streamlit session
+connection_manager = ConnectionManager()
@@ -0,0 +1,147 @@
+import duckdb
+import pandas as pd
+
+from core.config import (
+    PROFILE_SAMPLE_MODE,
+    PROFILE_SAMPLE_ROWS,
+    RESOURCE_MEMORY_MB,
+    RESOURCE_THREADS,
+    SCHEDULER_SLOTS
+)
+
+# Each scheduler slot gets an equal share of the machine budget
+SLOT_THREADS = max(1, RESOURCE_THREADS // SCHEDULER_SLOTS)
+SLOT_MEMORY_MB = max(256, RESOURCE_MEMORY_MB // SCHEDULER_SLOTS)
+
+NUMERIC_TYPES = (
+    "TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT",
+    "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT",
+    "FLOAT", "DOUBLE", "DECIMAL", "BOOLEAN"
+)
+
+
+def connect(database=":memory:"):
+    """DuckDB connection limited to one scheduler slot's threads and memory."""
+    return duckdb.connect(database, config={"threads": SLOT_THREADS, "memory_limit": f"{SLOT_MEMORY_MB}MB"})
+
+
+def is_numeric_type(column_type):
+    return str(column_type).upper().startswith(NUMERIC_TYPES)
+
+
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def quote_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def sample_relation(relation):
+    """Bounded sample used for sample values, date probing and quartiles."""
+    if PROFILE_SAMPLE_MODE == "random":
+        return f"(SELECT * FROM {relation} USING SAMPLE reservoir({PROFILE_SAMPLE_ROWS} ROWS) REPEATABLE (42))"
+    return f"(SELECT * FROM {relation} LIMIT {PROFILE_SAMPLE_ROWS})"
+
+
+def summarize_relation(con, relation, known=None):
+    """
+    Per-column stats for every column in one batched aggregate pass.
+
+    Returns the same columns as DuckDB's SUMMARIZE, plus the exact `null_count`
+    (`null_percentage` is rounded). Quartiles come from the
+    bounded sample, because exact or t-digest quantiles over every column cost
+    more than the rest of the pass combined.
+
+    `known` is `(row_count, {column: {"nulls", "min", "max"}})`, e.g. from a
+    Parquet footer; those counts and extremes are taken as given.
+    """
+    schema = con.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()
+    known_rows, known_columns = known or (None, {})
+
+    exprs = ["count(*)"] if known_rows is None else []
+    numeric = []
+    for name, column_type, *_ in schema:
+        col = quote_identifier(name)
+        exprs.append(f"approx_count_distinct({col})")
+        if name not in known_columns:
+            exprs += [f"count({col})", f"min({col})::VARCHAR", f"max({col})::VARCHAR"]
+        if is_numeric_type(column_type) and column_type != "BOOLEAN":
+            exprs += [f"avg({col})", f"stddev_samp({col})"]
+            numeric.append(name)
+
+    values = iter(con.execute(f"SELECT {', '.join(exprs)} FROM {relation}").fetchone())
+    total_rows = next(values) if known_rows is None else known_rows
+
+    quartiles = {}
+    if numeric:
+        row = con.execute(
+            "SELECT " + ", ".join(
+                f"quantile_cont({quote_identifier(c)}, [0.25, 0.5, 0.75])" for c in numeric
+            ) + f" FROM {sample_relation(relation)}"
+        ).fetchone()
+        quartiles = dict(zip(numeric, row))
+
+    rows = []
+    for name, column_type, *_ in schema:
+        approx_unique = next(values)
+        if name in known_columns:
+            column = known_columns[name]
+            non_null = total_rows - column["nulls"]
+            min_value, max_value = (None if v is None else str(v) for v in (column["min"], column["max"]))
+        else:
+            non_null, min_value, max_value = (next(values) for _ in range(3))
+        avg = std = None
+        if name in quartiles:
+            avg, std = next(values), next(values)
+        q25, q50, q75 = quartiles.get(name) or (None, None, None)
+
+        rows.append({
+            "column_name": name,
+            "column_type": column_type,
+            "min": min_value,
+            "max": max_value,
+            "approx_unique": approx_unique,
+            "avg": avg,
+            "std": std,
+            "q25": q25,
+            "q50": q50,
+            "q75": q75,
+            "count": total_rows,
+            "null_count": total_rows - non_null,
+            "null_percentage": round((total_rows - non_null) / total_rows * 100, 2) if total_rows else 0.0
+        })
+
+    return pd.DataFrame(rows, columns=[
+        "column_name", "column_type", "min", "max", "approx_unique", "avg",
+        "std", "q25", "q50", "q75", "count", "null_count", "null_percentage"
+    ])
+
+
+def describe_from_summary(summary_stats: pd.DataFrame):
+    """`df.describe().to_dict()`-shaped numeric stats, taken from SUMMARIZE output."""
+    def as_float(value):
+        return float(value) if value is not None and not pd.isna(value) else None
+
+    stats = {}
+    for _, row in summary_stats.iterrows():
+        # Only numeric (non-boolean) columns get a mean, as in `describe()`
+        if row["avg"] is None or pd.isna(row["avg"]):
+            continue
+
+        stats[row["column_name"]] = {
+            "count": int(row["count"] - row["null_count"]),
+            "mean": as_float(row["avg"]),
+            "std": as_float(row["std"]),
+            "min": as_float(row["min"]),
+            "25%": as_float(row["q25"]),
+            "50%": as_float(row["q50"]),
+            "75%": as_float(row["q75"]),
+            "max": as_float(row["max"])
+        }
+
+    return stats
+
+
+def missing_from_summary(summary_stats: pd.DataFrame):
+    return int(summary_stats["null_count"].sum())
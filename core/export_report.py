@@ -1,18 +1,124 @@
-import streamlit as st
+import base64
 import datetime
+import html
+import os
+import threading
+import uuid
+import weakref
 
-def export_conversation():
-    if not st.session_state.messages:
-        return None
+import streamlit as st
+
+from core.config import REPORT_DIR, REPORT_TABLE_ROWS, REPORT_TEXT_CHARS
+from core.results import StoredResult
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class ReportCache:
+    """
+    Rendered report sections of one session, spooled to a file and indexed by
+    message, so exporting a long session only renders the messages that are
+    new (or changed) since the last export. The spool and the last exported
+    report are removed with the session.
+    """
+
+    def __init__(self):
+        name = uuid.uuid4().hex
+        self.path = os.path.join(REPORT_DIR, f"{name}.sections")
+        self.report_path = os.path.join(REPORT_DIR, f"{name}.html")
+        self._index = {}  # seq -> (message version, offset, length)
+        self._lock = threading.Lock()
+        weakref.finalize(self, _remove, self.path)
+        weakref.finalize(self, _remove, self.report_path)
+
+    def get(self, seq, version):
+        with self._lock:
+            entry = self._index.get(seq)
+            if entry is None or entry[0] != version:
+                return None
+
+            _, offset, length = entry
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                return f.read(length).decode("utf-8")
+
+    def put(self, seq, version, section):
+        data = section.encode("utf-8")
+        with self._lock:
+            os.makedirs(REPORT_DIR, exist_ok=True)
+            # Append-only: a replaced section just leaves its old bytes unused
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(data)
+            self._index[seq] = (version, offset, len(data))
 
-    html_content = f"""
+
+def _text_html(text):
+    text = str(text)
+    if len(text) > REPORT_TEXT_CHARS:
+        text = text[:REPORT_TEXT_CHARS] + f"\n… ({len(text) - REPORT_TEXT_CHARS:,} more characters)"
+    return f"<pre>{html.escape(text)}</pre>"
+
+
+def _result_html(result):
+    if not isinstance(result, StoredResult):
+        return _text_html(result)
+
+    # First page only, and at most REPORT_TABLE_ROWS of it
+    shown = result.page(0).head(REPORT_TABLE_ROWS)
+    table = shown.to_html(border=0, classes="result")
+    if result.total_rows > len(shown):
+        table += f"<p class='note'>Showing {len(shown):,} of {result.total_rows:,} rows</p>"
+    return table
+
+
+def _output_html(output, figure_store):
+    if not isinstance(output, dict):
+        return _result_html(output)
+
+    parts = []
+    if output.get("sampled"):
+        sampled = output["sampled"]
+        parts.append(f"<p class='note'>Sampled preview: {sampled['rows']:,} of {sampled['total']:,} rows</p>")
+    if output.get("printed"):
+        parts.append(_text_html(output["printed"]))
+    if output.get("result") is not None:
+        parts.append(_result_html(output["result"]))
+    if output.get("figure"):
+        png = figure_store.load(output["figure"])
+        if png is not None:
+            parts.append(f"<img src='data:image/png;base64,{base64.b64encode(png).decode('ascii')}'>")
+    return "".join(parts)
+
+
+def render_section(msg, figure_store):
+    role = "Question" if msg["role"] == "user" else "Analysis"
+    content = html.escape(msg["content"]).replace("```python", "<pre><code>").replace("```", "</code></pre>")
+
+    section = f"<h3>{role}</h3>{content}<br>"
+    if msg.get("output") is not None:
+        section += _output_html(msg["output"], figure_store)
+    return section + "\n"
+
+
+def iter_report(messages, df, figure_store, cache=None):
+    """Yield the HTML report piece by piece; sections already in `cache` are not rendered again."""
+    yield f"""
     <html>
     <head>
+    <meta charset="utf-8">
     <style>
     body {{
         font-family: Arial;
         margin: 40px;
     }}
+    table.result {{ border-collapse: collapse; font-size: 13px; }}
+    table.result td, table.result th {{ padding: 2px 8px; border-bottom: 1px solid #ddd; }}
+    .note {{ color: gray; font-size: 12px; }}
+    img {{ max-width: 100%; }}
     </style>
     </head>
 
@@ -21,23 +127,41 @@ def export_conversation():
         <p>Generated on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}</p>
     """
 
-    if st.session_state.df is not None:
-        df = st.session_state.df
-        html_content += f"""
+    if df is not None:
+        yield f"""
         <h2>Dataset Info</h2>
         Rows: {df.shape[0]}<br>
         Columns: {df.shape[1]}<br>
-        Column Names: {', '.join(df.columns)}<br>
+        Column Names: {html.escape(', '.join(map(str, df.columns)))}<br>
         """
 
-    html_content += "<h2>Conversation</h2>"
+    yield "<h2>Conversation</h2>"
 
-    for msg in st.session_state.messages:
-        role = "Question" if msg["role"] == "user" else "Analysis"
-        content = msg["content"].replace("```python", "<pre><code>").replace("```", "</code></pre>")
+    for seq in range(len(messages)):
+        version = messages.version(seq) if cache is not None else None
+        section = cache.get(seq, version) if cache is not None else None
+        if section is None:
+            section = render_section(messages[seq], figure_store)
+            if cache is not None:
+                cache.put(seq, version, section)
+        yield section
 
-        html_content += f"<h3>{role}</h3>{content}<br>"
+    yield "</body></html>"
 
-    html_content += "</body></html>"
 
-    return html_content
\ No newline at end of file
+def export_conversation():
+    """Stream this session's report into a file and return its path."""
+    if not st.session_state.messages:
+        return None
+
+    cache = st.session_state.report_cache
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    with open(cache.report_path, "w", encoding="utf-8") as f:
+        for chunk in iter_report(
+            st.session_state.messages,
+            st.session_state.df,
+            st.session_state.figure_store,
+            cache=cache
+        ):
+            f.write(chunk)
+    return cache.report_path
@@ -0,0 +1,79 @@
+import hashlib
+import io
+import os
+import shutil
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+
+from core.config import CACHE_DIR, FIGURE_DPI, FIGURE_STORE_MB
+
+FIGURE_SPILL_DIR = os.path.join(CACHE_DIR, "figures")
+
+
+def render_png(fig):
+    """Rasterise a figure once through its own canvas (no pyplot state involved)."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    FigureCanvasAgg(fig)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=FIGURE_DPI, bbox_inches="tight", pil_kwargs={"optimize": True})
+    return buffer.getvalue()
+
+
+class FigureStore:
+    """
+    Per-session chart history as PNG bytes. Charts are content-addressed, kept
+    in memory up to a byte budget, and the least recently shown are spilled to
+    disk beyond it. Spilled files are removed when the session goes away.
+    """
+
+    def __init__(self, max_bytes=int(FIGURE_STORE_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.spill_dir = os.path.join(FIGURE_SPILL_DIR, uuid.uuid4().hex)
+        self._memory = OrderedDict()
+        self._spilled = set()
+        self._lock = threading.Lock()
+        weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, f"{key}.png")
+
+    def add(self, png):
+        """Store a chart and return the key history should keep."""
+        key = hashlib.blake2b(png, digest_size=16).hexdigest()
+        with self._lock:
+            if key not in self._memory and key not in self._spilled:
+                self._memory[key] = png
+                self.current_bytes += len(png)
+                self._evict()
+        return key
+
+    def load(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if key in self._spilled:
+                with open(self._spill_path(key), "rb") as f:
+                    return f.read()
+        return None
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and len(self._memory) > 1:
+            key, png = self._memory.popitem(last=False)
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(self._spill_path(key), "wb") as f:
+                f.write(png)
+            self._spilled.add(key)
+            self.current_bytes -= len(png)
+
+    def stats(self):
+        return {
+            "in_memory": len(self._memory),
+            "spilled": len(self._spilled),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes
+        }
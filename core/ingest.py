@@ -0,0 +1,219 @@
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pandas.api.types import union_categoricals
+
+from core.config import (
+    INGEST_SAMPLE_ROWS,
+    INGEST_CHUNK_ROWS,
+    CATEGORY_MAX_UNIQUE_RATIO
+)
+from core.columnar import read_arrow_table
+
+
+def _looks_like_dates(values: pd.Series):
+    if values.empty:
+        return False
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            pd.to_datetime(values, errors="raise")
+            return True
+        except Exception:
+            return False
+
+
+def infer_column_plan(sample: pd.DataFrame):
+    """Decide per-column handling from a sample of the file."""
+    categorical, dates = [], []
+
+    for col in sample.columns:
+        series = sample[col]
+        if series.dtype != object:
+            continue
+
+        non_null = series.dropna()
+        if _looks_like_dates(non_null):
+            dates.append(col)
+        elif non_null.nunique() <= CATEGORY_MAX_UNIQUE_RATIO * max(len(non_null), 1):
+            categorical.append(col)
+
+    return {"categorical": categorical, "dates": dates}
+
+
+def downcast_numeric(df: pd.DataFrame):
+    downcast = []
+
+    for col in df.columns:
+        series = df[col]
+
+        if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            smaller = pd.to_numeric(series, downcast="integer")
+
+        elif pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+            # Only keep float32 when it round-trips exactly, so sums don't drift
+            smaller = series.astype(np.float32)
+            if not np.array_equal(smaller.to_numpy(np.float64), series.to_numpy(), equal_nan=True):
+                continue
+
+        else:
+            continue
+
+        if smaller.dtype != series.dtype:
+            df[col] = smaller
+            downcast.append(col)
+
+    return downcast
+
+
+def _parse_date_categories(values: pd.Categorical):
+    """Parse each distinct value once, then expand through the category codes."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            parsed = pd.DatetimeIndex(pd.to_datetime(values.categories, errors="raise"))
+        except Exception:
+            return None
+
+    codes = values.codes
+    result = parsed.take(np.where(codes < 0, 0, codes)).to_numpy()
+    result[codes < 0] = np.datetime64("NaT")
+    return result
+
+
+def read_csv_lean(source):
+    """
+    Read a CSV in chunks with types inferred from a sample pass.
+
+    Low-cardinality text becomes categorical, integers (and exact floats)
+    are downcast, and date columns are parsed once per distinct value.
+    Returns the DataFrame plus ingestion stats (parse time, and peak memory
+    estimated from the chunks' `memory_usage`, not measured).
+    """
+    started = time.perf_counter()
+
+    source.seek(0)
+    sample = pd.read_csv(source, nrows=INGEST_SAMPLE_ROWS)
+    source.seek(0)
+
+    plan = infer_column_plan(sample)
+    as_category = plan["categorical"] + plan["dates"]
+
+    frames = []
+    category_parts = {col: [] for col in as_category}
+    retained_bytes = 0
+    frame_bytes = 0
+    peak_bytes = 0
+    chunks = 0
+    downcast = set()
+
+    reader = pd.read_csv(
+        source,
+        chunksize=INGEST_CHUNK_ROWS,
+        dtype={col: "category" for col in as_category}
+    )
+
+    for chunk in reader:
+        chunks += 1
+        raw_bytes = chunk.memory_usage(deep=True).sum()
+        peak_bytes = max(peak_bytes, retained_bytes + raw_bytes)
+
+        for col in as_category:
+            part = chunk.pop(col)
+            category_parts[col].append(part)
+            retained_bytes += part.memory_usage(deep=True)
+
+        downcast.update(downcast_numeric(chunk))
+        frames.append(chunk)
+        chunk_bytes = chunk.memory_usage(deep=True).sum()
+        frame_bytes += chunk_bytes
+        retained_bytes += chunk_bytes
+
+    # pd.concat briefly holds the chunks and their concatenated copy
+    peak_bytes = max(peak_bytes, retained_bytes + frame_bytes)
+
+    if frames:
+        df = pd.concat(frames, ignore_index=True)
+    else:
+        df = sample.iloc[:0].drop(columns=as_category)
+    frames = None
+
+    for col in as_category:
+        parts = category_parts.pop(col)
+        values = union_categoricals(parts) if parts else pd.Categorical([])
+
+        if col in plan["dates"]:
+            parsed = _parse_date_categories(values)
+            if parsed is not None:
+                df[col] = parsed
+                continue
+
+        # Sample misjudged the cardinality -> plain strings are smaller
+        if len(values.categories) > CATEGORY_MAX_UNIQUE_RATIO * max(len(values), 1):
+            df[col] = np.asarray(values, dtype=object)
+        else:
+            df[col] = values
+
+    df = df[sample.columns.tolist()]
+    final_bytes = int(df.memory_usage(deep=True).sum())
+
+    stats = {
+        "source": "csv",
+        "rows": len(df),
+        "chunks": chunks,
+        "parse_seconds": round(time.perf_counter() - started, 3),
+        "peak_memory_bytes": int(max(peak_bytes, final_bytes)),
+        "final_memory_bytes": final_bytes,
+        "categorical_columns": [c for c in plan["categorical"] if isinstance(df[c].dtype, pd.CategoricalDtype)],
+        "date_columns": [c for c in plan["dates"] if pd.api.types.is_datetime64_any_dtype(df[c])],
+        "downcast_columns": sorted(downcast)
+    }
+
+    return df, stats
+
+
+def read_columnar(path, fmt):
+    """
+    Load a memory-mapped Parquet / Feather / Arrow IPC file into pandas.
+    Column types come from the file, so there's nothing to infer or parse;
+    low-cardinality strings become categoricals as in the CSV path.
+    """
+    started = time.perf_counter()
+    table = read_arrow_table(path, fmt)
+
+    categorical = []
+    for i, field in enumerate(table.schema):
+        if not (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            continue
+        column = table.column(i)
+        non_null = len(column) - column.null_count
+        if non_null and pc.count_distinct(column).as_py() <= CATEGORY_MAX_UNIQUE_RATIO * non_null:
+            table = table.set_column(i, field.name, column.dictionary_encode())
+            categorical.append(field.name)
+
+    arrow_bytes = table.nbytes
+    # Frees each Arrow column as soon as it has been converted
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+
+    downcast = downcast_numeric(df)
+    final_bytes = int(df.memory_usage(deep=True).sum())
+
+    stats = {
+        "source": fmt,
+        "rows": len(df),
+        "chunks": 1,
+        "parse_seconds": round(time.perf_counter() - started, 3),
+        "peak_memory_bytes": int(max(arrow_bytes, final_bytes)),
+        "final_memory_bytes": final_bytes,
+        "categorical_columns": categorical,
+        "date_columns": [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])],
+        "downcast_columns": sorted(downcast)
+    }
+
+    return df, stats
@@ -0,0 +1,162 @@
+import ast
+import os
+import shutil
+
+import pandas as pd
+
+from core.config import CACHE_DIR, LARGE_DATASET_MAX_ROWS
+from core.duckdb_utils import (
+    connect,
+    quote_identifier,
+    quote_literal,
+    describe_from_summary,
+    missing_from_summary
+)
+
+SPOOL_DIR = os.path.join(CACHE_DIR, "spool")
+
+def projected_columns(code, columns):
+    """
+    The columns a block needs, if every use of `df` in it is a single column
+    (`df['col']` or `df.col`); None when it uses the frame as a whole
+    (groupby, boolean masks, reductions, len(df), ...), so projection would
+    change the answer.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    parents = {child: node for node in ast.walk(tree) for child in ast.iter_child_nodes(node)}
+    known = set(columns)
+    used = set()
+
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Name) and node.id == "df"):
+            continue
+        if not isinstance(node.ctx, ast.Load):
+            return None
+
+        parent = parents.get(node)
+        if isinstance(parent, ast.Attribute) and parent.attr in known:
+            used.add(parent.attr)
+        elif (
+            isinstance(parent, ast.Subscript)
+            and parent.value is node
+            and isinstance(parent.slice, ast.Constant)
+            and parent.slice.value in known
+            and isinstance(parent.ctx, ast.Load)
+        ):
+            used.add(parent.slice.value)
+        else:
+            return None
+
+    return [c for c in columns if c in used] or None
+
+
+class LargeDataset:
+    """
+    Dataset kept on disk as Parquet and queried through DuckDB.
+
+    Stands in for `st.session_state.df` in large dataset mode: it exposes
+    the bits of the DataFrame API the app reads (shape, columns, len, head)
+    and materialises pandas frames only on request.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        con = connect()
+        try:
+            schema = con.execute(f"DESCRIBE SELECT * FROM {self.relation}").fetchall()
+            self.row_count = con.execute(f"SELECT count(*) FROM {self.relation}").fetchone()[0]
+        finally:
+            con.close()
+
+        self.columns = [row[0] for row in schema]
+        self.dtypes = {row[0]: row[1] for row in schema}
+
+    @property
+    def relation(self):
+        return f"read_parquet({quote_literal(self.path)})"
+
+    @property
+    def shape(self):
+        return (self.row_count, len(self.columns))
+
+    @property
+    def empty(self):
+        return self.row_count == 0
+
+    def __len__(self):
+        return self.row_count
+
+    def query(self, sql):
+        con = connect()
+        try:
+            return con.execute(sql).fetchdf()
+        finally:
+            con.close()
+
+    def head(self, n=5):
+        return self.query(f"SELECT * FROM {self.relation} LIMIT {int(n)}")
+
+    def to_pandas(self, columns=None, max_rows=LARGE_DATASET_MAX_ROWS):
+        """Pull a (projected, possibly sampled) pandas frame."""
+        projection = ", ".join(quote_identifier(c) for c in columns) if columns else "*"
+        sql = f"SELECT {projection} FROM {self.relation}"
+
+        if max_rows is not None and self.row_count > max_rows:
+            sql += f" USING SAMPLE reservoir({int(max_rows)} ROWS) REPEATABLE (42)"
+
+        return self.query(sql)
+
+    def frame_for_code(self, code):
+        """Materialise only the columns a block reads, or every column if it uses the whole frame."""
+        return self.to_pandas(columns=projected_columns(code, self.columns))
+
+    def is_sampled(self):
+        return self.row_count > LARGE_DATASET_MAX_ROWS
+
+
+def spool_upload(uploaded_file, path, chunk_size=1 << 20):
+    """Stream an upload to a file without holding a second copy in memory."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    uploaded_file.seek(0)
+    with open(path + ".tmp", "wb") as f:
+        shutil.copyfileobj(uploaded_file, f, chunk_size)
+    uploaded_file.seek(0)
+
+    os.replace(path + ".tmp", path)
+
+
+def spool_to_parquet(uploaded_file, parquet_path):
+    """Stream the upload to disk and let DuckDB convert it without pandas."""
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+
+    csv_path = os.path.join(SPOOL_DIR, os.path.basename(os.path.dirname(parquet_path)) + ".csv")
+    spool_upload(uploaded_file, csv_path)
+
+    con = connect()
+    try:
+        con.execute(
+            f"COPY (SELECT * FROM read_csv_auto({quote_literal(csv_path)})) "
+            f"TO {quote_literal(parquet_path + '.tmp')} (FORMAT PARQUET)"
+        )
+    finally:
+        con.close()
+        os.remove(csv_path)
+
+    os.replace(parquet_path + ".tmp", parquet_path)
+
+
+def build_large_summary(dataset: LargeDataset, summary_stats: pd.DataFrame):
+    return {
+        "shape": dataset.shape,
+        "columns": dataset.columns,
+        "dtypes": dataset.dtypes,
+        "sample": dataset.head(3).to_dict(),
+        "stats": describe_from_summary(summary_stats),
+        "missing_values": missing_from_summary(summary_stats)
+    }
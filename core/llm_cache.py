@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from core.config import LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_MB
+
+
+def cache_key(model, system_prompt, history, user_input):
+    """Key on the model, the system prompt hash, the history window and the question."""
+    payload = json.dumps({
+        "model": model,
+        "system": hashlib.sha256(system_prompt.encode()).hexdigest(),
+        "history": history,
+        "user": user_input.strip()
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed reply cache with TTL and total-size eviction."""
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                 max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " reply TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across session threads
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT reply, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            if now - row[1] > self.ttl_seconds:
+                con.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+
+            con.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key, reply):
+        now = time.time()
+        with self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO responses (key, reply, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, reply, len(reply.encode()), now, now)
+            )
+            self._evict(con, now)
+
+    def _evict(self, con, now):
+        con.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+
+        total = con.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Drop least recently used replies until we are back under budget
+        rows = con.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        con.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self):
+        with self._connect() as con:
+            con.execute("DELETE FROM responses")
+
+
+response_cache = LLMResponseCache()
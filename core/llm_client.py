@@ -1,25 +1,112 @@
 import streamlit as st
-import openai
+import time
+from core.llm_cache import cache_key, response_cache
+from core.prompt_context import count_tokens
+from core.tracing import span, start_span
 
-def generate_llm_response(client, system_prompt, user_input):
+MODEL = "gpt-4o-mini"
 
-    messages = [{"role": "system", "content": system_prompt}]
 
-    for msg in st.session_state.messages[-6:]:
+def build_history(history_window=6):
+    history = []
+    for msg in st.session_state.messages[-history_window:]:
         content = msg["content"]
         if len(content) > 500:
             content = content[:500] + "..."
-        messages.append({"role": msg["role"], "content": content})
+        history.append({"role": msg["role"], "content": content})
+    return history
+
+
+def _prepare_request(system_prompt, user_input):
+    history = build_history()
 
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(history)
     messages.append({"role": "user", "content": user_input})
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        temperature=0.1,
-        max_tokens=1500
-    )
+    # Same model, prompt, recent history and question -> reuse the earlier reply
+    key = cache_key(MODEL, system_prompt, history, user_input)
+
+    return key, messages
+
+
+def _prompt_tokens(messages):
+    return sum(count_tokens(m["content"]) for m in messages)
+
+
+def generate_llm_response(client, system_prompt, user_input, use_cache=True):
+
+    key, messages = _prepare_request(system_prompt, user_input)
+
+    with span("llm.request", model=MODEL, streamed=False) as request:
+        if use_cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                request.set("cache_hit", True)
+                return cached
+
+        response = client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0.1,
+            max_tokens=1500
+        )
+
+        reply = response.choices[0].message.content
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            request.set("tokens.prompt", usage.prompt_tokens)
+            request.set("tokens.completion", usage.completion_tokens)
+
+    if reply:
+        response_cache.put(key, reply)
+
+    return reply
+
+
+def stream_llm_response(client, system_prompt, user_input, use_cache=True):
+    """Like `generate_llm_response`, but yields the reply as text deltas."""
+
+    key, messages = _prepare_request(system_prompt, user_input)
+
+    # A generator can't hold the tracing context across yields -> span ended by hand.
+    # Streams carry no usage block, so token counts are local estimates.
+    request = start_span("llm.request", model=MODEL, streamed=True, **{"tokens.prompt": _prompt_tokens(messages)})
+    try:
+        if use_cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                request.set("cache_hit", True)
+                yield cached
+                return
+
+        stream = client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0.1,
+            max_tokens=1500,
+            stream=True
+        )
 
-    reply = response.choices[0].message.content
+        parts = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    request.set("time_to_first_token_ms", round((time.time_ns() - request.start_ns) / 1e6, 1))
+                parts.append(delta)
+                yield delta
 
-    return reply
\ No newline at end of file
+        # Only complete replies are cached; an interrupted stream never gets here
+        reply = "".join(parts)
+        request.set("tokens.completion", count_tokens(reply))
+        if reply:
+            response_cache.put(key, reply)
+    except Exception as e:
+        request.end(error=e)
+        raise
+    finally:
+        request.end()
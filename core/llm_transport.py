@@ -0,0 +1,234 @@
+import asyncio
+import queue
+import random
+import threading
+import time
+import types
+
+import openai
+
+from core.config import (
+    OPENAI_BASE_URL,
+    LLM_TIMEOUT_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_SECOND,
+    LLM_HEDGE_AFTER_SECONDS
+)
+
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+
+_STREAM_DONE = object()
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` request starts per second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _EventLoopThread:
+    """One background asyncio loop for the whole process; sessions submit into it."""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="llm-transport", daemon=True
+                ).start()
+            return self._loop
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+_event_loop = _EventLoopThread()
+
+# Process-wide limits: every session's requests queue on these
+_concurrency = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_rate_limiter = RateLimiter(LLM_REQUESTS_PER_SECOND)
+
+
+def backoff_delay(attempt, base=0.5, cap=20.0):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ResilientLLMClient:
+    """
+    Async OpenAI client with per-request timeouts, jittered retries, a shared
+    concurrency/rate limit and optional hedged requests.
+
+    Exposes the same `client.chat.completions.create(...)` call as the OpenAI
+    SDK, so the rest of the app (and test stubs) don't need to change.
+    """
+
+    def __init__(self, api_key, base_url=OPENAI_BASE_URL, timeout=LLM_TIMEOUT_SECONDS,
+                 max_retries=LLM_MAX_RETRIES, hedge_after=LLM_HEDGE_AFTER_SECONDS):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+
+        # Retries and timeouts are handled here, not by the SDK
+        self._client = openai.AsyncOpenAI(
+            api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout
+        )
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    # ---- Async API ----
+
+    async def _attempt(self, kwargs):
+        await _rate_limiter.acquire()
+        async with _concurrency:
+            return await asyncio.wait_for(
+                self._client.chat.completions.create(**kwargs), self.timeout
+            )
+
+    async def _hedged_attempt(self, kwargs):
+        if self.hedge_after <= 0:
+            return await self._attempt(kwargs)
+
+        primary = asyncio.ensure_future(self._attempt(kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        # Slow first request -> race a duplicate and keep whichever succeeds first
+        pending = {primary, asyncio.ensure_future(self._attempt(kwargs))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _with_retries(self, attempt, kwargs):
+        for attempt_no in range(self.max_retries + 1):
+            try:
+                return await attempt(kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt_no == self.max_retries:
+                    raise
+                delay = _retry_after(e) or backoff_delay(attempt_no)
+                await asyncio.sleep(delay)
+
+    async def acreate(self, **kwargs):
+        if kwargs.get("stream"):
+            raise ValueError("Use `create(..., stream=True)` for streaming requests.")
+        return await self._with_retries(self._hedged_attempt, kwargs)
+
+    async def _open_stream(self, kwargs):
+        # Only opening the stream is retried; once tokens flow we can't replay them.
+        # Each try waits its turn at the rate limit, and a failed try gives its slot
+        # back, so the backoff sleep doesn't hold a slot other requests could use.
+        await _rate_limiter.acquire()
+        await _concurrency.acquire()
+        try:
+            return await asyncio.wait_for(self._client.chat.completions.create(**kwargs), self.timeout)
+        except BaseException:
+            _concurrency.release()
+            raise
+
+    async def _pump_stream(self, kwargs, out):
+        try:
+            # On success the slot stays held until the stream is read to the end
+            stream = await self._with_retries(self._open_stream, kwargs)
+            try:
+                iterator = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    out.put(chunk)
+            finally:
+                _concurrency.release()
+        except BaseException as e:
+            out.put(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            out.put(_STREAM_DONE)
+
+    # ---- Sync facade (Streamlit script thread) ----
+
+    def create(self, **kwargs):
+        if kwargs.get("stream"):
+            return self._stream(kwargs)
+        return _event_loop.submit(self.acreate(**kwargs)).result()
+
+    def _stream(self, kwargs):
+        out = queue.Queue()
+        future = _event_loop.submit(self._pump_stream(kwargs, out))
+        try:
+            while True:
+                item = out.get()
+                if item is _STREAM_DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Consumer went away early (e.g. Streamlit rerun) -> stop the request
+            future.cancel()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_client(api_key):
+    """One client per API key for the whole process, so connections are pooled."""
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = ResilientLLMClient(api_key)
+        return _clients[api_key]
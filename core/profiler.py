@@ -1,47 +1,195 @@
+import numpy as np
 import pandas as pd
 import warnings
 
-def profile_dataframe(df: pd.DataFrame):
+from core.config import PROFILE_SAMPLE_MODE, PROFILE_SAMPLE_ROWS
+from core.duckdb_utils import connect, quote_identifier, is_numeric_type, sample_relation
+
+# Columns with at most this many (approximate) distinct values get an exact count
+EXACT_DISTINCT_MAX = 100_000
+
+# Non-null values per column kept from the sample: 3 are shown, 5 are probed for dates
+SAMPLE_VALUES = 5
+
+# HyperLogLog with 2**14 registers: ~0.8% standard error, 16 KB per column
+HLL_PRECISION = 14
+
+SUMMARY_COLUMNS = [
+    "column_name", "column_type", "min", "max", "approx_unique", "avg",
+    "std", "q25", "q50", "q75", "count", "null_count", "null_percentage"
+]
+
+
+def approx_distinct(values):
+    """HyperLogLog distinct count over a 1-D array, fully vectorised."""
+    if len(values) == 0:
+        return 0
+
+    m = 1 << HLL_PRECISION
+    hashes = pd.util.hash_array(np.asarray(values))
+
+    buckets = (hashes >> np.uint64(64 - HLL_PRECISION)).astype(np.intp)
+    rest = (hashes << np.uint64(HLL_PRECISION)) | np.uint64(1 << (HLL_PRECISION - 1))
+    # Position of the first set bit = 64 - bit_length(rest) + 1
+    ranks = (65 - (np.floor(np.log2(rest.astype(np.float64))) + 1)).astype(np.uint8)
+
+    registers = np.zeros(m, dtype=np.uint8)
+    np.maximum.at(registers, buckets, ranks)
+
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    empty = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and empty:
+        # Small-range correction (linear counting) is near exact for low cardinalities
+        estimate = m * np.log(m / empty)
+
+    return int(round(estimate))
+
+
+def _sample_frame(df):
+    if PROFILE_SAMPLE_MODE == "random" and len(df) > PROFILE_SAMPLE_ROWS:
+        return df.sample(n=PROFILE_SAMPLE_ROWS, random_state=42)
+    return df.head(PROFILE_SAMPLE_ROWS)
+
+
+def _column_stats(series, sample):
+    stats = {"min": None, "max": None, "avg": None, "std": None,
+             "q25": None, "q50": None, "q75": None}
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Exact and cheap: count the category codes actually in use
+        codes = series.cat.codes.to_numpy()
+        present = codes[codes >= 0]
+        used = np.flatnonzero(np.bincount(present, minlength=len(series.cat.categories)))
+        stats["non_null"] = len(present)
+        stats["approx_unique"] = len(used)
+        if len(used):
+            values = series.cat.categories[used]
+            try:
+                stats["min"], stats["max"] = str(values.min()), str(values.max())
+            except TypeError:
+                pass
+        return stats
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        # Plain NumPy reductions: no per-call NaN re-scanning as in pandas' skipna ops
+        if pd.api.types.is_integer_dtype(series.dtype) and not series.hasnans:
+            values = series.to_numpy()
+        else:
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+
+        stats["non_null"] = len(values)
+        stats["approx_unique"] = approx_distinct(values)
+
+        if len(values):
+            stats["min"], stats["max"] = float(values.min()), float(values.max())
+            stats["avg"] = float(values.mean(dtype=np.float64))
+            stats["std"] = float(values.std(dtype=np.float64, ddof=1)) if len(values) > 1 else None
+            quartiles = sample.dropna().quantile([0.25, 0.5, 0.75]).tolist()
+            if len(quartiles) == 3:
+                stats["q25"], stats["q50"], stats["q75"] = quartiles
+        return stats
+
+    mask = series.notna().to_numpy()
+    non_null = series if mask.all() else series[mask]
+    stats["non_null"] = len(non_null)
+    stats["approx_unique"] = approx_distinct(non_null.to_numpy())
+
+    if not non_null.empty and (
+        pd.api.types.is_datetime64_any_dtype(series) or pd.api.types.is_bool_dtype(series)
+    ):
+        stats["min"], stats["max"] = str(non_null.min()), str(non_null.max())
+
+    return stats
+
+
+def summarize_frame(df: pd.DataFrame):
+    """
+    Per-column stats for a pandas frame using NumPy reductions, in the same
+    shape as DuckDB's SUMMARIZE (see `duckdb_utils.summarize_relation`).
+    """
     total_rows = len(df)
-    profile = []
+    sample = _sample_frame(df)
+
+    rows = []
+    for i, col in enumerate(df.columns):
+        stats = _column_stats(df.iloc[:, i], sample.iloc[:, i])
+        non_null = stats.pop("non_null")
 
-    for col in df.columns:
-        series = df[col]
-        non_null = series.dropna()
+        rows.append({
+            "column_name": str(col),
+            "column_type": str(df.dtypes.iloc[i]),
+            **stats,
+            "count": total_rows,
+            "null_count": total_rows - non_null,
+            "null_percentage": round((total_rows - non_null) / total_rows * 100, 2) if total_rows else 0.0
+        })
 
-        unique_count = series.nunique(dropna=True)
-        missing_count = series.isna().sum()
-        missing_pct = round((missing_count / total_rows) * 100, 2) if total_rows else 0
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
 
+
+def _pandas_kind(series):
+    if pd.api.types.is_numeric_dtype(series):
+        return "Numeric"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "Datetime"
+    return "Text"
+
+
+def _duckdb_kind(column_type):
+    if str(column_type).upper().startswith(("DATE", "TIMESTAMP", "TIME")):
+        return "Datetime"
+    if is_numeric_type(column_type):
+        return "Numeric"
+    return "Text"
+
+
+def _parses_as_dates(values):
+    # Try parsing datetime safely (no warnings)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            pd.to_datetime(pd.Series(values), errors="raise")
+            return True
+        except Exception:
+            return False
+
+
+def _build_profile(summary_stats, total_rows, dtypes, kinds, unique_counts, samples, exact_unique):
+    """
+    Assemble the profile table from batched per-column stats.
+    `exact_unique(i)` is only called to confirm Potential ID candidates.
+    """
+    profile = []
+
+    for i, (_, row) in enumerate(summary_stats.iterrows()):
+        col = row["column_name"]
         col_name_lower = col.lower()
+        sample = samples[i] or []
+        kind = kinds[i]
+
+        null_count = int(row["null_count"])
+        missing_pct = null_count / total_rows * 100 if total_rows else 0
+        # Two decimals, but a handful of nulls in a big column still shows as non-zero
+        missing_pct = round(missing_pct, 2) or float(f"{missing_pct:.1g}")
+        unique_count = min(unique_counts[i], total_rows)
 
         # -------- Detect basic column type --------
-        if pd.api.types.is_numeric_dtype(series):
-            detected_type = "Numeric"
+        detected_type = kind
+        if kind == "Text" and sample:
+            if _parses_as_dates(sample):
+                detected_type = "Datetime (parsed)"
+            elif unique_count / max(total_rows, 1) < 0.2:
+                detected_type = "Categorical"
 
-        elif pd.api.types.is_datetime64_any_dtype(series):
-            detected_type = "Datetime"
+        # -------- Heuristics --------
+        id_like = null_count == 0 and any(x in col_name_lower for x in ["id", "order", "user"])
 
-        else:
-            detected_type = "Text"
-
-            # Try parsing datetime safely (no warnings)
-            if not non_null.empty:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    try:
-                        pd.to_datetime(non_null.iloc[:5], errors="raise")
-                        detected_type = "Datetime (parsed)"
-                    except Exception:
-                        if unique_count / max(total_rows, 1) < 0.2:
-                            detected_type = "Categorical"
+        # Confirm approximate counts exactly, but only for ID candidates
+        if id_like and 0.97 * total_rows <= unique_count:
+            unique_count = exact_unique(i)
 
-        # -------- Heuristics --------
-        is_id = (
-            unique_count == total_rows and
-            missing_count == 0 and
-            any(x in col_name_lower for x in ["id", "order", "user"])
-        )
+        is_id = id_like and unique_count == total_rows
 
         is_date = (
             "date" in col_name_lower or
@@ -51,12 +199,12 @@ def profile_dataframe(df: pd.DataFrame):
 
         # -------- Sample values (Arrow-safe) --------
         # IMPORTANT: convert to string to avoid Arrow crashes
-        sample_values = ", ".join(map(str, non_null.head(3).tolist()))
+        sample_values = ", ".join(map(str, sample[:3]))
 
         profile.append({
             "Column": col,
             "Detected Type": detected_type,
-            "Pandas Dtype": str(series.dtype),
+            "Pandas Dtype": dtypes[i],
             "Unique Values": unique_count,
             "Missing %": missing_pct,
             "Potential ID": "Yes" if is_id else "No",
@@ -65,4 +213,81 @@ def profile_dataframe(df: pd.DataFrame):
         })
 
     # -------- Final Arrow-safe DataFrame --------
-    return pd.DataFrame(profile).astype(str)
\ No newline at end of file
+    return pd.DataFrame(profile, columns=[
+        "Column", "Detected Type", "Pandas Dtype", "Unique Values",
+        "Missing %", "Potential ID", "Possible Date", "Sample Values"
+    ]).astype(str)
+
+
+def profile_dataframe(df: pd.DataFrame, summary_stats=None):
+    """
+    Column profile from one batched pass of NumPy reductions (null counts,
+    HyperLogLog distinct counts, min/max) instead of per-column pandas calls.
+    Pass `summary_stats` from `summarize_frame` to reuse an existing pass.
+    """
+    if summary_stats is None:
+        summary_stats = summarize_frame(df)
+
+    sample = _sample_frame(df)
+    samples = [
+        sample.iloc[:, i].dropna().head(SAMPLE_VALUES).tolist()
+        for i in range(df.shape[1])
+    ]
+
+    return _build_profile(
+        summary_stats,
+        len(df),
+        dtypes=[str(dtype) for dtype in df.dtypes],
+        kinds=[_pandas_kind(df.iloc[:, i]) for i in range(df.shape[1])],
+        unique_counts=summary_stats["approx_unique"].astype(int).tolist(),
+        samples=samples,
+        exact_unique=lambda i: df.iloc[:, i].nunique(dropna=True)
+    )
+
+
+def profile_large_dataset(dataset, summary_stats):
+    """
+    Same profile table as `profile_dataframe`, computed from DuckDB aggregates
+    over the Parquet file instead of an in-memory pandas copy.
+    """
+    relation = dataset.relation
+    columns = dataset.columns
+
+    con = connect()
+    try:
+        # First few non-null values of every column, from a bounded sample
+        sample_exprs = ", ".join(
+            f"array_slice(list({quote_identifier(c)}) FILTER (WHERE {quote_identifier(c)} IS NOT NULL), 1, {SAMPLE_VALUES})"
+            for c in columns
+        )
+        samples = con.execute(f"SELECT {sample_exprs} FROM {sample_relation(relation)}").fetchone()
+
+        # DuckDB's HyperLogLog is noticeably off on small domains; those are cheap to count exactly
+        unique_counts = summary_stats["approx_unique"].astype(int).tolist()
+        low_cardinality = [i for i, n in enumerate(unique_counts) if n <= EXACT_DISTINCT_MAX]
+        if low_cardinality:
+            counts = con.execute(
+                "SELECT " + ", ".join(f"count(DISTINCT {quote_identifier(columns[i])})" for i in low_cardinality)
+                + f" FROM {relation}"
+            ).fetchone()
+            for i, count in zip(low_cardinality, counts):
+                unique_counts[i] = count
+
+        def exact_unique(i):
+            return con.execute(
+                f"SELECT count(DISTINCT {quote_identifier(columns[i])}) FROM {relation}"
+            ).fetchone()[0]
+
+        dtypes = [dataset.dtypes[c] for c in columns]
+
+        return _build_profile(
+            summary_stats,
+            dataset.row_count,
+            dtypes=dtypes,
+            kinds=[_duckdb_kind(t) for t in dtypes],
+            unique_counts=unique_counts,
+            samples=samples,
+            exact_unique=exact_unique
+        )
+    finally:
+        con.close()
@@ -0,0 +1,146 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.code_cache import code_cache
+from core.config import PROGRESSIVE_MIN_ROWS, PROGRESSIVE_SAMPLE_ROWS
+from core.results import decode_value
+from core.scheduler import scheduler
+from core.worker_pool import error_payload
+
+# Samples kept built (they are shared by every session on the same dataset)
+MAX_CACHED_SAMPLES = 4
+# Strata finer than this stop being useful: most groups would get a single row
+MAX_STRATA = 500
+
+_samples = OrderedDict()
+_samples_lock = threading.Lock()
+
+
+def wants_preview(df, code):
+    """Only big in-memory frames are worth a sampled first pass, and only if the code reads `df`."""
+    return (
+        isinstance(df, pd.DataFrame)
+        and len(df) >= PROGRESSIVE_MIN_ROWS
+        and len(df) > PROGRESSIVE_SAMPLE_ROWS
+        and re.search(r"\bdf\b", code) is not None
+    )
+
+
+def stratify_columns(profile):
+    """The one or two categorical columns (per the profiler) with the fewest values to stratify on."""
+    categorical = profile[profile["Detected Type"] == "Categorical"]
+    unique = pd.to_numeric(categorical["Unique Values"], errors="coerce").fillna(0)
+
+    columns, groups = [], 1
+    for column, count in sorted(zip(categorical["Column"], unique), key=lambda item: item[1]):
+        if count < 2:
+            continue
+        if groups * count > MAX_STRATA or len(columns) == 2:
+            break
+        columns.append(column)
+        groups *= int(count)
+    return columns
+
+
+def stratified_sample(df, columns, rows=PROGRESSIVE_SAMPLE_ROWS, seed=42):
+    """
+    About `rows` rows with every stratum kept in proportion (and at least one
+    row each, so rare categories still show up). Row order is preserved.
+    """
+    rng = np.random.default_rng(seed)
+    if not columns:
+        return df.iloc[np.sort(rng.choice(len(df), size=rows, replace=False))]
+
+    codes = df.groupby(columns, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    quota = np.maximum(1, np.round(np.bincount(codes) * rows / len(df))).astype(int)
+
+    # Shuffle, then keep each stratum's first `quota` rows
+    order = rng.permutation(len(df))
+    shuffled = codes[order]
+    rank = pd.Series(shuffled).groupby(shuffled).cumcount().to_numpy()
+    return df.iloc[np.sort(order[rank < quota[shuffled]])]
+
+
+def get_sample(key, df, profile):
+    """Stratified sample of a dataset, built once per content hash."""
+    with _samples_lock:
+        if key in _samples:
+            _samples.move_to_end(key)
+            return _samples[key]
+
+    columns = stratify_columns(profile)
+    sample = {"frame": stratified_sample(df, columns), "columns": columns, "total_rows": len(df)}
+
+    with _samples_lock:
+        _samples[key] = sample
+        while len(_samples) > MAX_CACHED_SAMPLES:
+            _samples.popitem(last=False)
+    return sample
+
+
+def output_from_payload(payload, figure_store):
+    """A successful payload as kept in chat history (the chart goes into the session's figure store)."""
+    return {
+        "printed": payload["printed"],
+        "result": decode_value(payload["result"]),
+        "figure": figure_store.add(payload["figure_png"]) if payload["figure_png"] else None
+    }
+
+
+class BackgroundRun:
+    """
+    The full-data run of a block whose sampled preview is already on screen.
+    It waits for a scheduler slot and runs in the worker pool without blocking
+    the script; the chat history polls it and swaps in the result when done.
+    """
+
+    def __init__(self, pool, code, dataset_ref, session_id, total_rows, cache_key=None):
+        self.id = uuid.uuid4().hex
+        self.code = code
+        self.cache_key = cache_key  # where the full result goes in the code cache, if cacheable
+        self.total_rows = total_rows
+        self.started = time.monotonic()
+        self.message_index = None  # set once the reply is recorded
+        self.payload = None
+
+        self._job = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        threading.Thread(
+            target=self._run, args=(pool, dataset_ref, session_id), name="code-full-run", daemon=True
+        ).start()
+
+    def _run(self, pool, dataset_ref, session_id):
+        try:
+            with scheduler.slot(session_id, "code"):
+                if self._cancel.is_set():
+                    self.payload = error_payload("CancelledError", "Execution was cancelled.")
+                    return
+                self._job = pool.submit(self.code, dataset_ref)
+                if self._cancel.is_set():
+                    self._job.cancel()
+                self.payload = self._job.result()
+                if self.cache_key is not None:
+                    code_cache.put(self.cache_key, self.payload)
+        except Exception as e:
+            self.payload = error_payload(type(e).__name__, str(e))
+        finally:
+            self._done.set()
+
+    def cancel(self):
+        self._cancel.set()
+        if self._job is not None:
+            self._job.cancel()
+
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
@@ -0,0 +1,203 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from core.config import PROMPT_CONTEXT_TOKENS
+from core.duckdb_utils import quote_identifier
+from core.large_dataset import LargeDataset
+
+# Columns with at most this many distinct values get their most common values listed
+TOP_VALUES_MAX_UNIQUE = 50
+TOP_VALUES = 5
+SAMPLE_ROWS = 5
+# Small datasets are sent whole when they fit in the budget
+FULL_DATA_MAX_ROWS = 100
+MAX_VALUE_CHARS = 40
+_DIGEST_CACHE_SIZE = 32
+
+# Without tiktoken, tokens are estimated from length. Schema text (names, numbers,
+# punctuation) runs nearer 3 characters per token than prose's 4, so the estimate
+# errs high and the digest stays inside its budget.
+FALLBACK_CHARS_PER_TOKEN = 3
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Token count with tiktoken, or a deliberately high estimate if it can't be loaded."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // FALLBACK_CHARS_PER_TOKEN + 1
+
+
+def _fmt(value):
+    if isinstance(value, pd.Timestamp) and value == value.normalize():
+        value = value.date()
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else f"{value:.2f}"
+    text = str(value)
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS] + "…"
+
+
+def _sql_type(dtype):
+    if isinstance(dtype, str):
+        return dtype  # already a DuckDB type (large dataset mode)
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "VARCHAR"
+
+
+# ---- Facts the profile doesn't carry: value ranges of dates, most common values ----
+
+def _column_facts(df, profile):
+    facts = {}
+    for _, row in profile.iterrows():
+        column = row["Column"]
+        unique = int(row["Unique Values"])
+        detected = row["Detected Type"]
+
+        if detected == "Datetime":
+            if isinstance(df, LargeDataset):
+                low, high = df.query(
+                    f"SELECT min({quote_identifier(column)}), max({quote_identifier(column)}) FROM {df.relation}"
+                ).iloc[0]
+            else:
+                low, high = df[column].min(), df[column].max()
+            facts[column] = f"{_fmt(low)} → {_fmt(high)}"
+
+        elif detected != "Numeric" and row["Potential ID"] != "Yes" and unique <= TOP_VALUES_MAX_UNIQUE:
+            if isinstance(df, LargeDataset):
+                col = quote_identifier(column)
+                counts = df.query(
+                    f"SELECT {col} AS v, count(*) AS n FROM {df.relation} "
+                    f"WHERE {col} IS NOT NULL GROUP BY 1 ORDER BY 2 DESC LIMIT {TOP_VALUES}"
+                ).itertuples(index=False)
+            else:
+                counts = df[column].value_counts().head(TOP_VALUES).items()
+            values = ", ".join(f"{_fmt(v)} ({n})" for v, n in counts)
+            more = f" +{unique - TOP_VALUES} more" if unique > TOP_VALUES else ""
+            facts[column] = f"top values: {values}{more}"
+
+    return facts
+
+
+def _column_line(row, dtype, stats, facts, sql):
+    column = row["Column"]
+    name = quote_identifier(column) if sql else column
+    kind = _sql_type(dtype) if sql else str(dtype)
+
+    parts = [f"{int(row['Unique Values']):,} distinct"]
+    if row["Potential ID"] == "Yes":
+        parts.append("unique identifier")
+    if float(row["Missing %"]) > 0:
+        parts.append(f"{float(row['Missing %']):g}% missing")
+
+    if column in stats:
+        s = stats[column]
+        parts.append(f"range {_fmt(float(s['min']))} to {_fmt(float(s['max']))}, mean {_fmt(float(s['mean']))}")
+    elif column in facts:
+        parts.append(facts[column])
+    elif row["Sample Values"]:
+        parts.append("e.g. " + ", ".join(_fmt(v) for v in str(row["Sample Values"]).split(", ")[:3]))
+
+    return f"- {name} {kind}: " + "; ".join(parts)
+
+
+def _fit_lines(lines, budget):
+    kept, used = [], 0
+    for line in lines:
+        cost = count_tokens(line)
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return kept, used
+
+
+def build_schema_digest(df, summary, profile, kind="python", budget=PROMPT_CONTEXT_TOKENS):
+    """
+    Compact dataset description for the prompts: one line per column with
+    type, cardinality, range or top values, then sample rows while the token
+    budget allows. Wide tables fall back to bare column names.
+    """
+    sql = kind == "sql"
+    rows, n_columns = summary["shape"]
+    dtypes = df.dtypes if isinstance(df, LargeDataset) else summary["dtypes"]
+    stats = summary["stats"]
+    facts = _column_facts(df, profile)
+
+    header = f"Rows: {rows:,}. Columns: {n_columns}."
+    remaining = budget - count_tokens(header)
+
+    column_lines = [
+        _column_line(row, dtypes[row["Column"]], stats, facts, sql)
+        for _, row in profile.iterrows()
+    ]
+    # Keep room for the names of columns whose details don't fit
+    kept, used = _fit_lines(column_lines, int(remaining * 0.8))
+    remaining -= used
+
+    sections = [header, "Columns:", *kept]
+
+    if len(kept) < len(column_lines):
+        names = [
+            quote_identifier(c) if sql else c
+            for c in summary["columns"][len(kept):]
+        ]
+        shown, used = _fit_lines([n + "," for n in names], remaining - 10)
+        remaining -= used
+        line = "Other columns: " + " ".join(shown).rstrip(",")
+        if len(shown) < len(names):
+            line += f" … and {len(names) - len(shown)} more"
+        sections.append(line)
+
+    # ---- Sample rows (the whole table when it's small enough) ----
+    if remaining > 50:
+        small = not isinstance(df, LargeDataset) and len(df) <= FULL_DATA_MAX_ROWS
+        sample = df if small else df.head(SAMPLE_ROWS)
+        sample_lines = sample.to_csv(index=False).strip().split("\n")
+        if len(kept) < len(column_lines):
+            sample_lines = []  # rows of a table this wide would only be cut off
+
+        shown, _ = _fit_lines(sample_lines, remaining)
+        if len(shown) > 1:
+            label = "Full data (CSV):" if small and len(shown) == len(sample_lines) else "Sample rows (CSV):"
+            sections += [label, *shown]
+
+    return "\n".join(sections)
+
+
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def get_schema_digest(fingerprint, df, summary, profile, kind="python", budget=PROMPT_CONTEXT_TOKENS):
+    """Digest computed once per dataset, prompt kind and budget."""
+    key = (fingerprint, type(df).__name__, kind, budget)
+    with _digests_lock:
+        if key in _digests:
+            _digests.move_to_end(key)
+            return _digests[key]
+
+    digest = build_schema_digest(df, summary, profile, kind, budget)
+
+    with _digests_lock:
+        _digests[key] = digest
+        while len(_digests) > _DIGEST_CACHE_SIZE:
+            _digests.popitem(last=False)
+    return digest
@@ -1,20 +1,16 @@
 import streamlit as st
+from core.workspace import build_workspace_context
 
 def build_system_prompt():
-    df = st.session_state.df
-
-    if len(df) > 100:
-        data_context = f"""
-        Dataset shape: {st.session_state.data_summary['shape']}
-        Columns: {', '.join(st.session_state.data_summary['columns'])}
-        Data types: {st.session_state.data_summary['dtypes']}
-        Sample rows: {st.session_state.data_summary['sample']}
-        Basic statistics: {st.session_state.data_summary['stats']}
-        """
-    else:
-        data_context = f"""
-        Full dataset:
-        {df.to_string()}
+    # Precomputed once per dataset and kept within the prompt token budget
+    data_context = build_workspace_context(kind="python")
+
+    if st.session_state.workspace_tables:
+        data_context += """
+
+        Only `df` is loaded in pandas. To use the other tables, call `query(sql)`: it runs
+        DuckDB SQL over `df` and the tables above and returns a pandas DataFrame, so do
+        joins, filters and aggregations inside the SQL.
         """
 
     system_prompt = f"""You are a highly skilled data analyst AI assistant.
@@ -46,6 +42,8 @@ def build_system_prompt():
 
     - Do NOT import pandas, matplotlib, seaborn (already imported).
     - Use `df` directly (it is already loaded).
+    - Text columns with few distinct values are pandas categoricals: pass
+      `observed=True` to `groupby` / `pivot_table` so only values present in the data appear.
     - For every visualization:
         plt.figure(figsize=(10, 6))
         ... your chart ...
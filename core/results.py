@@ -0,0 +1,148 @@
+import io
+import json
+import pickle
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.config import RESULT_PAGE_ROWS
+
+# Parquet key-value metadata holding the size of the full result when only part was kept
+_TOTAL_ROWS_KEY = b"ask_csv.total_rows"
+# Original column labels of a result whose columns were renamed to be unique
+_COLUMN_LABELS_KEY = b"ask_csv.column_labels"
+
+
+def unique_names(labels):
+    """`labels` with repeats numbered (`count`, `count.1`, ...), clear of every other label."""
+    taken = set(labels)
+    names, used = [], set()
+    for label in labels:
+        name, n = label, 0
+        while name in used or (n and name in taken):
+            n += 1
+            name = f"{label}.{n}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def to_arrow(value):
+    """
+    Convert a DataFrame/Series result to an Arrow table. Only the columns Arrow
+    can't encode (mixed object types, ...) are turned into strings. Repeated
+    column labels (e.g. from `pd.concat(..., axis=1)`) are numbered, and the
+    originals are kept in the schema metadata for `StoredResult` to restore.
+    """
+    frame = value.to_frame() if isinstance(value, pd.Series) else value
+    frame = frame.rename(columns=str)
+
+    if not frame.columns.has_duplicates:
+        return _frame_to_table(frame)
+
+    labels = [str(label) for label in frame.columns]
+    table = _frame_to_table(frame.set_axis(unique_names(labels), axis=1))
+    return table.replace_schema_metadata({
+        **(table.schema.metadata or {}), _COLUMN_LABELS_KEY: json.dumps(labels).encode()
+    })
+
+
+def _frame_to_table(frame):
+    try:
+        return pa.Table.from_pandas(frame)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+
+    frame = frame.copy(deep=False)
+    for column in frame.columns:
+        try:
+            pa.array(frame[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            frame[column] = frame[column].astype(str)
+
+    try:
+        return pa.Table.from_pandas(frame)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # What's left is the index
+        frame.index = frame.index.astype(str)
+        return pa.Table.from_pandas(frame)
+
+
+class StoredResult:
+    """
+    A tabular result kept as compressed Parquet bytes, one row group per page,
+    so history holds a compact copy and a page is decoded only when shown.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        metadata = pq.ParquetFile(pa.BufferReader(data)).metadata
+        self.num_rows = metadata.num_rows
+        self.num_pages = metadata.num_row_groups
+        self.total_rows = int((metadata.metadata or {}).get(_TOTAL_ROWS_KEY, self.num_rows))
+        labels = (metadata.metadata or {}).get(_COLUMN_LABELS_KEY)
+        self.column_labels = json.loads(labels) if labels else None
+
+    @classmethod
+    def from_table(cls, table, total_rows=None):
+        if total_rows is not None and total_rows != table.num_rows:
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}), _TOTAL_ROWS_KEY: str(total_rows).encode()
+            })
+
+        sink = io.BytesIO()
+        pq.write_table(table, sink, row_group_size=RESULT_PAGE_ROWS, compression="zstd")
+        return cls(sink.getvalue())
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    def _restore_labels(self, frame):
+        if self.column_labels is not None:
+            frame.columns = self.column_labels
+        return frame
+
+    def page(self, number=0):
+        if self.num_pages == 0:
+            return self.to_pandas()
+
+        frame = pq.ParquetFile(pa.BufferReader(self.data)).read_row_group(number).to_pandas()
+        if isinstance(frame.index, pd.RangeIndex):
+            # A stored RangeIndex restarts at 0 in every row group
+            frame.index = frame.index + self.page_bounds(number)[0]
+        return self._restore_labels(frame)
+
+    def page_bounds(self, number=0):
+        start = number * RESULT_PAGE_ROWS
+        return start, min(start + RESULT_PAGE_ROWS, self.num_rows)
+
+    def to_pandas(self):
+        return self._restore_labels(pq.read_table(pa.BufferReader(self.data)).to_pandas())
+
+
+def encode_value(value):
+    """Serialise a code result for the trip from a worker process back to the app."""
+    if value is None:
+        return None
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return {"kind": "parquet", "data": StoredResult.from_table(to_arrow(value)).data}
+
+    try:
+        return {"kind": "pickle", "data": pickle.dumps(value)}
+    except Exception:
+        # Modules, open handles, ... -> show their repr instead
+        return {"kind": "repr", "data": repr(value)}
+
+
+def decode_value(payload):
+    if payload is None:
+        return None
+
+    if payload["kind"] == "parquet":
+        return StoredResult(payload["data"])
+    if payload["kind"] == "pickle":
+        return pickle.loads(payload["data"])
+    return payload["data"]
@@ -0,0 +1,339 @@
+import json
+import re
+import threading
+
+import pandas as pd
+
+from core.config import ROLLUP_MAX_CARDINALITY, ROLLUP_MAX_DIMENSIONS, ROLLUP_MAX_RATIO
+from core.duckdb_manager import connection_manager
+from core.duckdb_utils import is_numeric_type, quote_identifier
+from core.scheduler import scheduler
+
+ROLLUP_TABLE = "__rollup"
+ROWS_COLUMN = "__rows"
+
+# Dates are kept per month, so coarser grains can still be answered
+DATE_GRAINS = {"month", "quarter", "year"}
+DATE_GRAIN_FUNCTIONS = {"year", "quarter", "month"}
+# strftime formats that only show year/month parts
+_MONTH_FORMAT = re.compile(r"^(?:[^%]|%[Yymb]|%B|%%)*$")
+
+# Expression classes the rewrite understands; anything else (subqueries, windows, *) is left alone
+_PLAIN_CLASSES = {"CONSTANT", "COMPARISON", "CONJUNCTION", "OPERATOR", "CAST", "CASE", "BETWEEN"}
+
+
+class _Unsupported(Exception):
+    pass
+
+
+class Rollup:
+    """
+    A month-level aggregate of `df` over its low-cardinality categorical columns,
+    kept in the session's DuckDB connection. SUM/COUNT/MIN/MAX/AVG queries that
+    only group and filter by those columns (and by month/quarter/year) are
+    rewritten to re-aggregate the rollup instead of scanning the table.
+    """
+
+    def __init__(self, dimensions, date_column, measures, rows, base_rows, aggregates, base_columns):
+        self.dimensions = dimensions
+        self.date_column = date_column
+        self.measures = measures
+        self.rows = rows
+        self.base_rows = base_rows
+        self._aggregates = aggregates
+        # Every column of `df`: a name that is one of these is never read as a select alias
+        self._base_columns = {c.lower() for c in base_columns}
+        self._columns = {c.lower(): c for c in dimensions + measures + ([date_column] if date_column else [])}
+        self._fragments = {}
+
+    # ---- AST helpers (DuckDB's own parser, via json_serialize_sql) ----
+
+    @staticmethod
+    def _parse(con, sql):
+        parsed = json.loads(con.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+        if parsed.get("error") or len(parsed["statements"]) != 1:
+            raise _Unsupported()
+        return parsed
+
+    def _fragment(self, con, expression, alias):
+        if expression not in self._fragments:
+            self._fragments[expression] = self._parse(con, f"SELECT {expression}")["statements"][0]["node"]["select_list"][0]
+        return dict(json.loads(json.dumps(self._fragments[expression])), alias=alias)
+
+    # ---- Rewrite ----
+
+    def rewrite(self, con, sql):
+        """The rollup version of `sql`, or None if it can't be answered from the rollup."""
+        try:
+            parsed = self._parse(con, sql)
+            node = parsed["statements"][0]["node"]
+            self._check_shape(node)
+
+            self._con = con
+            self._qualifiers = {"df"} | ({node["from_table"]["alias"].lower()} if node["from_table"]["alias"] else set())
+            self._aliases = {item["alias"].lower() for item in node["select_list"] if item.get("alias")}
+            self._aggregated = False
+
+            # Unnamed output columns keep the names the original query would have given them
+            schema = [tuple(row[:2]) for row in con.execute(f"DESCRIBE {sql}").fetchall()]
+            names = [name for name, _ in schema]
+            select_list = []
+            for item, name in zip(node["select_list"], names):
+                rewritten = self._expression(item)
+                select_list.append(dict(rewritten, alias=item["alias"] or name))
+            node["select_list"] = select_list
+
+            for key in ("where_clause", "having"):
+                if node.get(key) is not None:
+                    node[key] = self._expression(node[key])
+            node["group_expressions"] = [self._expression(e) for e in node["group_expressions"]]
+            for modifier in node["modifiers"]:
+                if modifier["type"] == "ORDER_MODIFIER":
+                    for order in modifier["orders"]:
+                        order["expression"] = self._expression(order["expression"])
+                elif modifier["type"] == "DISTINCT_MODIFIER":
+                    modifier["distinct_on_targets"] = [self._expression(e) for e in modifier["distinct_on_targets"]]
+
+            # Without aggregation every base row is a result row; the rollup can't reproduce that
+            if not self._aggregated and not node["group_expressions"]:
+                return None
+
+            node["from_table"]["table_name"] = ROLLUP_TABLE
+            rewritten = con.execute("SELECT json_deserialize_sql(?)", [json.dumps(parsed)]).fetchone()[0]
+
+            # Bind check: the rewrite must compile and give the same column names and types
+            if [tuple(row[:2]) for row in con.execute(f"DESCRIBE {rewritten}").fetchall()] != schema:
+                return None
+            return rewritten
+        except Exception:
+            # Unsupported shape, or anything DuckDB rejects: the original query runs as written
+            return None
+        finally:
+            self._con = None
+
+    def _check_shape(self, node):
+        table = node.get("from_table") or {}
+        if (
+            node.get("type") != "SELECT_NODE"
+            or node["cte_map"]["map"]
+            or table.get("type") != "BASE_TABLE"
+            or table.get("table_name", "").lower() != "df"
+            or table.get("schema_name")
+            or table.get("sample") is not None
+            or node.get("qualify") is not None
+            or node.get("sample") is not None
+            or any(m["type"] not in ("ORDER_MODIFIER", "LIMIT_MODIFIER", "DISTINCT_MODIFIER") for m in node["modifiers"])
+        ):
+            raise _Unsupported()
+
+    def _column(self, node):
+        names = [n.lower() for n in node["column_names"]]
+        if len(names) == 2 and names[0] in self._qualifiers:
+            names = names[1:]
+        if len(names) != 1:
+            raise _Unsupported()
+        return self._columns.get(names[0]), names[0]
+
+    def _expression(self, node):
+        kind = node["class"]
+
+        if kind == "COLUMN_REF":
+            column, name = self._column(node)
+            if column in self.dimensions or (name in self._aliases and name not in self._base_columns):
+                return node
+            raise _Unsupported()
+
+        if kind == "FUNCTION":
+            name = node["function_name"].lower()
+            if name in self._aggregates:
+                return self._aggregate(node, name)
+            if self._is_date_grain(node, name):
+                return node
+            return self._map_children(node)
+
+        if kind in _PLAIN_CLASSES:
+            return self._map_children(node)
+
+        raise _Unsupported()
+
+    def _map_children(self, node):
+        def walk(value):
+            if isinstance(value, dict):
+                if "class" in value:
+                    return self._expression(value)
+                return {k: walk(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [walk(v) for v in value]
+            return value
+
+        return {key: (value if key == "value" else walk(value)) for key, value in node.items()}
+
+    def _constant(self, node):
+        if node["class"] != "CONSTANT" or node["value"]["is_null"]:
+            return None
+        return node["value"]["value"]
+
+    def _is_date_column(self, node):
+        return node["class"] == "COLUMN_REF" and self._column(node)[0] == self.date_column
+
+    def _is_date_grain(self, node, name):
+        if self.date_column is None:
+            return False
+        args = node["children"]
+
+        if name in DATE_GRAIN_FUNCTIONS and len(args) == 1:
+            return self._is_date_column(args[0])
+        if name in ("date_trunc", "datetrunc", "date_part", "datepart") and len(args) == 2:
+            part = self._constant(args[0])
+            return isinstance(part, str) and part.lower() in DATE_GRAINS and self._is_date_column(args[1])
+        if name == "strftime" and len(args) == 2:
+            fmt = self._constant(args[1])
+            return isinstance(fmt, str) and _MONTH_FORMAT.match(fmt) is not None and self._is_date_column(args[0])
+        return False
+
+    def _aggregate(self, node, name):
+        if node.get("distinct") or node.get("filter") is not None or node["order_bys"]["orders"]:
+            raise _Unsupported()
+        self._aggregated = True
+        args = node["children"]
+
+        if name == "count_star" or (name == "count" and not args):
+            return self._fragment(self._con, f"coalesce(sum({quote_identifier(ROWS_COLUMN)}), 0)::BIGINT", node["alias"])
+
+        if len(args) != 1 or args[0]["class"] != "COLUMN_REF":
+            raise _Unsupported()
+        measure, _ = self._column(args[0])
+        if measure not in self.measures:
+            raise _Unsupported()
+
+        column = lambda suffix: quote_identifier(f"{measure}__{suffix}")
+        expression = {
+            "sum": f"sum({column('sum')})",
+            "count": f"coalesce(sum({column('count')}), 0)::BIGINT",
+            "min": f"min({column('min')})",
+            "max": f"max({column('max')})",
+            "avg": f"(sum({column('sum')}) / sum({column('count')}))::DOUBLE",
+            "mean": f"(sum({column('sum')}) / sum({column('count')}))::DOUBLE",
+        }.get(name)
+        if expression is None:
+            raise _Unsupported()
+        return self._fragment(self._con, expression, node["alias"])
+
+
+# ---------------------------------------------------------------------------
+# Building
+# ---------------------------------------------------------------------------
+
+def _candidates(profile, types):
+    detected = dict(zip(profile["Column"], profile["Detected Type"]))
+    unique = dict(zip(profile["Column"], pd.to_numeric(profile["Unique Values"], errors="coerce").fillna(0)))
+    potential_id = dict(zip(profile["Column"], profile["Potential ID"]))
+
+    dimensions = sorted(
+        (c for c in types if detected.get(c) == "Categorical" and 1 < unique.get(c, 0) <= ROLLUP_MAX_CARDINALITY),
+        key=lambda c: unique[c]
+    )[:ROLLUP_MAX_DIMENSIONS]
+    date_column = next(
+        (c for c in types if str(detected.get(c, "")).startswith("Datetime")
+         and types[c].upper().startswith(("DATE", "TIMESTAMP"))),
+        None
+    )
+    measures = [
+        c for c in types
+        if detected.get(c) == "Numeric" and potential_id.get(c) != "Yes"
+        and is_numeric_type(types[c]) and types[c] != "BOOLEAN"
+    ]
+    return dimensions, date_column, measures
+
+
+def build_rollup(con, profile):
+    """Materialise the rollup table for `df`, or return None if no small enough rollup exists."""
+    types = {name: column_type for name, column_type, *_ in con.execute("DESCRIBE df").fetchall()}
+    dimensions, date_column, measures = _candidates(profile, types)
+    base_rows = con.execute("SELECT count(*) FROM df").fetchone()[0]
+    if not base_rows or not (dimensions or date_column):
+        return None
+
+    month = (
+        f"date_trunc('month', {quote_identifier(date_column)})::{types[date_column]}"
+        if date_column else None
+    )
+
+    # Drop the finest dimension until the rollup is much smaller than the table
+    while True:
+        keys = [quote_identifier(d) for d in dimensions] + ([month] if month else [])
+        if not keys:
+            return None
+        groups = con.execute(f"SELECT count(*) FROM (SELECT DISTINCT {', '.join(keys)} FROM df)").fetchone()[0]
+        if groups <= base_rows * ROLLUP_MAX_RATIO:
+            break
+        if dimensions:
+            dimensions = dimensions[:-1]
+        else:
+            month = date_column = None
+
+    columns = [quote_identifier(d) for d in dimensions]
+    if month:
+        columns.append(f"{month} AS {quote_identifier(date_column)}")
+    columns.append(f"count(*) AS {quote_identifier(ROWS_COLUMN)}")
+    for m in measures:
+        col = quote_identifier(m)
+        columns += [
+            f"sum({col}) AS {quote_identifier(m + '__sum')}",
+            f"count({col}) AS {quote_identifier(m + '__count')}",
+            f"min({col}) AS {quote_identifier(m + '__min')}",
+            f"max({col}) AS {quote_identifier(m + '__max')}",
+        ]
+    con.execute(
+        f"CREATE OR REPLACE TABLE {quote_identifier(ROLLUP_TABLE)} AS "
+        f"SELECT {', '.join(columns)} FROM df GROUP BY ALL"
+    )
+
+    aggregates = {
+        row[0].lower() for row in con.execute(
+            "SELECT DISTINCT function_name FROM duckdb_functions() WHERE function_type = 'aggregate'"
+        ).fetchall()
+    } | {"count_star"}
+    return Rollup(dimensions, date_column, measures, groups, base_rows, aggregates, list(types))
+
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def schedule_rollup(session_id, fingerprint, df, tables, profile):
+    """Build the session's rollup in the background, unless its connection already has (or is building) one."""
+    conn = connection_manager.peek(session_id)
+    if conn is not None and conn.fingerprint == fingerprint and conn.rollup_status is not None:
+        return
+
+    with _pending_lock:
+        if (session_id, fingerprint) in _pending:
+            return
+        _pending.add((session_id, fingerprint))
+
+    def build():
+        try:
+            with scheduler.slot(session_id, "rollup"):
+                conn = connection_manager.get(session_id, fingerprint, df, tables)
+                if conn.rollup_status is not None:
+                    return
+                conn.rollup_status = "building"
+
+                # A cursor of its own, so the session's queries aren't blocked meanwhile
+                cursor = conn.con.cursor()
+                try:
+                    conn.rollup = build_rollup(cursor, profile)
+                    conn.rollup_status = "ready" if conn.rollup is not None else "unavailable"
+                except Exception:
+                    conn.rollup_status = "unavailable"
+                finally:
+                    cursor.close()
+        except Exception:
+            # Connection replaced or closed mid-build; the next schedule starts over
+            pass
+        finally:
+            with _pending_lock:
+                _pending.discard((session_id, fingerprint))
+
+    threading.Thread(target=build, name="rollup-build", daemon=True).start()
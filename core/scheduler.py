@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from core.config import SCHEDULER_SLOTS
+from core.tracing import span
+
+
+class Ticket:
+    def __init__(self, session_id, kind):
+        self.session_id = session_id
+        self.kind = kind
+        self.granted = threading.Event()
+
+
+class Scheduler:
+    """
+    Admission control for heavy work (SQL queries, code blocks, profiling).
+    At most `slots` jobs run at once; waiting jobs are queued per session and
+    sessions take turns, so one busy session can't starve the others.
+    """
+
+    def __init__(self, slots=SCHEDULER_SLOTS):
+        self.slots = slots
+        self.running = 0
+        self._queues = OrderedDict()  # session -> deque of tickets, in turn order
+        self._lock = threading.Lock()
+
+    def _dispatch(self):
+        while self.running < self.slots and self._queues:
+            session_id, tickets = next(iter(self._queues.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                # This session had its turn; it goes to the back
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+
+            self.running += 1
+            ticket.granted.set()
+
+    def enqueue(self, ticket):
+        with self._lock:
+            self._queues.setdefault(ticket.session_id, deque()).append(ticket)
+            self._dispatch()
+
+    def release(self, ticket):
+        with self._lock:
+            if ticket.granted.is_set():
+                self.running -= 1
+            else:
+                # Gave up while waiting (script stopped / rerun)
+                tickets = self._queues.get(ticket.session_id)
+                if tickets is not None and ticket in tickets:
+                    tickets.remove(ticket)
+                    if not tickets:
+                        del self._queues[ticket.session_id]
+            self._dispatch()
+
+    def position(self, ticket):
+        """1-based place of a waiting ticket in the dispatch order (0 once it runs)."""
+        with self._lock:
+            if ticket.granted.is_set():
+                return 0
+
+            # Sessions take turns, so the dispatch order interleaves their queues round by round
+            queues = [list(tickets) for tickets in self._queues.values()]
+            place = 0
+            for depth in range(max((len(q) for q in queues), default=0)):
+                for tickets in queues:
+                    if depth < len(tickets):
+                        place += 1
+                        if tickets[depth] is ticket:
+                            return place
+            return place
+
+    def stats(self):
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "running": self.running,
+                "queued": sum(len(tickets) for tickets in self._queues.values())
+            }
+
+    @contextmanager
+    def slot(self, session_id, kind):
+        """Hold one slot for the duration of the block, waiting for a turn if all are busy."""
+        ticket = Ticket(session_id, kind)
+        self.enqueue(ticket)
+        try:
+            if not ticket.granted.is_set():
+                self._wait(ticket)
+            yield
+        finally:
+            self.release(ticket)
+
+    def _wait(self, ticket):
+        # Only show the queue position in the UI when called from a Streamlit script
+        placeholder = st.empty() if get_script_run_ctx() is not None else None
+
+        with span("scheduler.wait", kind=ticket.kind):
+            while not ticket.granted.wait(0.25):
+                if placeholder is not None:
+                    stats = self.stats()
+                    placeholder.info(
+                        f"⏳ Waiting for a free slot: #{self.position(ticket)} in line "
+                        f"({stats['running']} of {stats['slots']} slots busy)"
+                    )
+
+        if placeholder is not None:
+            placeholder.empty()
+
+
+# Process-wide: shared by every Streamlit session
+scheduler = Scheduler()
@@ -1,16 +1,262 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
 import duckdb
 import pandas as pd
+import pyarrow as pa
+from core.config import SQL_EXPORT_DIR, SQL_MAX_ESTIMATED_ROWS, SQL_MAX_RESULT_ROWS, SQL_RESULT_CACHE_MB
+from core.duckdb_manager import connection_manager
+from core.scheduler import scheduler
+from core.tracing import span
+
+# Quoted strings/identifiers are kept verbatim, everything else is case-folded
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(\s+)|([^'\"\s]+)")
+
+
+def normalize_sql(sql: str) -> str:
+    parts = []
+    for quoted, space, word in _SQL_TOKENS.findall(sql.strip().rstrip(";").strip()):
+        if quoted:
+            parts.append(quoted)
+        elif space:
+            parts.append(" ")
+        else:
+            parts.append(word.lower())
+    return "".join(parts)
+
+
+def check_read_only(sql: str) -> str:
+    """
+    Parse `sql` and return it if it is a single read-only statement.
+    Uses DuckDB's parser, so column names like `created_at` don't trip a keyword filter.
+    """
+    try:
+        statements = duckdb.extract_statements(sql)
+    except duckdb.Error as e:
+        raise ValueError(f"Could not parse the SQL query: {e}") from e
 
-def execute_sql_query(df: pd.DataFrame, sql: str) -> pd.DataFrame:
-    # Safety guard: allow SELECT only
-    forbidden = ["insert", "update", "delete", "drop", "create", "alter"]
-    if any(word in sql.lower() for word in forbidden):
+    if len(statements) != 1:
+        raise ValueError("Please run one SQL statement at a time.")
+    if statements[0].type != duckdb.StatementType.SELECT:
         raise ValueError("Only SELECT queries are allowed in SQL mode.")
 
-    con = duckdb.connect(database=":memory:")
-    con.register("df", df)
+    return sql.strip().rstrip(";").strip()
+
+
+def _estimated_rows(node):
+    # The root operator's estimate is the planned output size; operators without one
+    # pass their child's through, except cross products, which multiply their inputs
+    estimate = node.get("extra_info", {}).get("Estimated Cardinality")
+    if estimate is not None:
+        return int(estimate)
+    if "LIMIT" in node.get("name", ""):
+        # Bounded by the query itself and streamed, so the input size doesn't matter
+        return None
+
+    children = [_estimated_rows(child) for child in node.get("children") or []]
+    if not children or None in children:
+        return None
+    if node.get("name", "").strip() == "CROSS_PRODUCT":
+        product = 1
+        for rows in children:
+            product *= rows
+        return product
+    return children[0]
+
+
+def estimate_rows(con, sql):
+    """Rows DuckDB's planner expects `sql` to return (None if it can't say)."""
+    try:
+        plan = json.loads(con.execute(f"EXPLAIN (FORMAT JSON) {sql}").fetchall()[0][1])
+        return _estimated_rows(plan[0])
+    except (duckdb.Error, ValueError, IndexError, KeyError):
+        return None
+
+
+def _pandas_compatible(table):
+    # DuckDB ENUMs arrive as dictionaries with unsigned indices, which pandas can't convert
+    fields = []
+    for field in table.schema:
+        if pa.types.is_dictionary(field.type) and not pa.types.is_signed_integer(field.type.index_type):
+            field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+        fields.append(field)
+    return table.cast(pa.schema(fields))
+
+
+class SQLResult:
+    """The fetched (possibly capped) rows of a query and the size of the full result."""
+
+    def __init__(self, table, total_rows, rewritten_sql=None):
+        self.table = table
+        self.total_rows = total_rows
+        # The query that actually ran, when it was answered from the rollup
+        self.rewritten_sql = rewritten_sql
+
+    @property
+    def num_rows(self):
+        return self.table.num_rows
+
+    @property
+    def truncated(self):
+        return self.total_rows > self.table.num_rows
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+
+def _fetch_capped(con, sql, max_rows):
+    """Stream `sql` in record batches, stopping once `max_rows` rows have arrived."""
+    reader = con.execute(sql).fetch_record_batch(min(max_rows + 1, 100_000))
+
+    batches, fetched = [], 0
+    for batch in reader:
+        batches.append(batch)
+        fetched += batch.num_rows
+        if fetched > max_rows:
+            break
+
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    return table.slice(0, max_rows) if fetched > max_rows else table, fetched > max_rows
+
+
+class SQLResultCache:
+    """LRU of query results (SQLResult, Arrow-backed) bounded by a byte budget."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        size = result.nbytes
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key).nbytes
+
+            self._entries[key] = result
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+result_cache = SQLResultCache(int(SQL_RESULT_CACHE_MB * 1024 * 1024))
+
+
+def execute_sql(df: pd.DataFrame, sql: str, fingerprint=None, session_id="default",
+                tables=None, max_rows=SQL_MAX_RESULT_ROWS, use_rollup=False) -> SQLResult:
+    """
+    Run a read-only query and fetch at most `max_rows` rows of it. With `use_rollup`,
+    aggregate queries the session's rollup can answer are rewritten to read it instead.
+    """
+    sql = check_read_only(sql)
+
+    with span("sql.execute") as sql_span:
+        # Results are only cacheable when we know exactly which data they came from
+        cache_key = (fingerprint, normalize_sql(sql), max_rows, use_rollup) if fingerprint else None
+        if cache_key is not None:
+            result = result_cache.get(cache_key)
+            if result is not None:
+                sql_span.set("cache_hit", True)
+                sql_span.set("rows", result.num_rows)
+                return result
+
+        with scheduler.slot(session_id, "sql"):
+            # Reuse the session's connection; the table is only loaded when the dataset changes
+            with span("sql.connection"):
+                conn = connection_manager.get(session_id, fingerprint or id(df), df, tables)
+
+            with conn.lock:
+                estimate = estimate_rows(conn.con, sql)
+                sql_span.set("estimated_rows", estimate)
+                if estimate is not None and estimate > SQL_MAX_ESTIMATED_ROWS:
+                    raise ValueError(
+                        f"This query would produce about {estimate:,} rows, which usually means a missing "
+                        "join condition. Add a join condition, filters or an aggregation."
+                    )
+
+                rewritten_sql = None
+                if use_rollup and conn.rollup is not None:
+                    rewritten_sql = conn.rollup.rewrite(conn.con, sql)
+                if rewritten_sql is not None:
+                    try:
+                        table, truncated = _fetch_capped(conn, rewritten_sql, max_rows)
+                    except duckdb.Error:
+                        # A rewrite DuckDB rejects must not cost the answer; run the query as written
+                        rewritten_sql = None
+                if rewritten_sql is None:
+                    table, truncated = _fetch_capped(conn, sql, max_rows)
+                sql_span.set("rollup", rewritten_sql is not None)
+
+                total_rows = table.num_rows
+                if truncated:
+                    # Counting skips the columns, so it is far cheaper than fetching the rows
+                    total_rows = conn.con.execute(f"SELECT count(*) FROM ({rewritten_sql or sql})").fetchone()[0]
+
+        result = SQLResult(_pandas_compatible(table), total_rows, rewritten_sql)
+        if cache_key is not None:
+            result_cache.put(cache_key, result)
+
+        sql_span.set("cache_hit", False)
+        sql_span.set("rows", result.num_rows)
+        sql_span.set("total_rows", total_rows)
+        return result
+
+
+def export_sql_parquet(df: pd.DataFrame, sql: str, fingerprint=None, session_id="default", tables=None) -> str:
+    """Write the full result of `sql` to a Parquet file inside DuckDB (nothing passes through pandas)."""
+    sql = check_read_only(sql)
+    key = hashlib.blake2b(repr((fingerprint, normalize_sql(sql))).encode(), digest_size=16).hexdigest()
+    path = os.path.join(SQL_EXPORT_DIR, f"{key}.parquet")
+    if fingerprint and os.path.exists(path):
+        return path
+
+    os.makedirs(SQL_EXPORT_DIR, exist_ok=True)
+    with span("sql.export"), scheduler.slot(session_id, "sql"):
+        conn = connection_manager.get(session_id, fingerprint or id(df), df, tables)
+        with conn.lock:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            escaped = tmp_path.replace("'", "''")
+            conn.con.execute(f"COPY ({sql}) TO '{escaped}' (FORMAT parquet, COMPRESSION zstd)")
+            os.replace(tmp_path, path)
+    return path
+
+
+def execute_sql_table(df: pd.DataFrame, sql: str, fingerprint=None, session_id="default",
+                      tables=None, max_rows=SQL_MAX_RESULT_ROWS, use_rollup=False) -> pa.Table:
+    return execute_sql(df, sql, fingerprint, session_id, tables, max_rows, use_rollup).table
 
-    result = con.execute(sql).fetchdf()
-    con.close()
 
-    return result
\ No newline at end of file
+def execute_sql_query(df: pd.DataFrame, sql: str, fingerprint=None, session_id="default") -> pd.DataFrame:
+    return execute_sql_table(df, sql, fingerprint, session_id).to_pandas()
@@ -1,11 +1,24 @@
-def build_sql_prompt(data_summary):
+import streamlit as st
+from core.workspace import build_workspace_context
+
+
+def build_sql_prompt():
+    schema = build_workspace_context(kind="sql")
+
+    if st.session_state.workspace_tables:
+        tables = "The main table is named `df`. The other tables below can be joined with it by name."
+        table_rule = "- Reference the main table as `df` and the others by their names"
+    else:
+        tables = "The data is available as a single SQL table named `df`."
+        table_rule = "- Always reference table as `df`"
+
     return f"""
 You are a senior data analyst writing SQL queries.
 
-The data is available as a single SQL table named `df`.
+{tables}
 
 Table schema:
-Columns: {', '.join(data_summary['columns'])}
+{schema}
 
 RULES (MANDATORY):
 - Output ONLY a SQL query
@@ -14,8 +27,9 @@ RULES (MANDATORY):
 - DO NOT explain anything
 - DO NOT wrap in markdown
 - DO NOT add comments
-- Always reference table as `df`
+{table_rule}
+- Quote column names with double quotes exactly as listed
 - Use LIMIT when appropriate
 
 The SQL query will be executed using DuckDB.
-"""
\ No newline at end of file
+"""
@@ -1,8 +1,34 @@
+from collections import deque
+
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from core.config import TRACE_HISTORY
+from core.conversation_store import ConversationStore
+from core.export_report import ReportCache
+from core.figure_store import FigureStore
+
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "default"
+
 
 def init_session_state():
+    # Recent messages in memory, the rest in SQLite (behaves like a list)
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        st.session_state.messages = ConversationStore()
+
+    # Chart PNGs referenced from messages by key
+    if "figure_store" not in st.session_state:
+        st.session_state.figure_store = FigureStore()
+
+    # Hold on the process-wide copy of the dataset (core/dataset_store.py)
+    if "dataset_ref" not in st.session_state:
+        st.session_state.dataset_ref = None
+
+    # Rendered report sections, reused by the next export
+    if "report_cache" not in st.session_state:
+        st.session_state.report_cache = ReportCache()
 
     if "df" not in st.session_state:
         st.session_state.df = None
@@ -13,6 +39,58 @@ def init_session_state():
     if "data_profile" not in st.session_state:
         st.session_state.data_profile = None
 
+    # Ingestion cache: content hash of the loaded upload
+    if "dataset_hash" not in st.session_state:
+        st.session_state.dataset_hash = None
+
+    if "dataset_file_id" not in st.session_state:
+        st.session_state.dataset_file_id = None
+
+    if "ingest_stats" not in st.session_state:
+        st.session_state.ingest_stats = None
+
+    # Extra uploads attached as DuckDB views: {name: {"file", "hash", "dataset", "summary", "profile", "ref"}}
+    if "workspace_tables" not in st.session_state:
+        st.session_state.workspace_tables = {}
+
+    if "workspace_file_ids" not in st.session_state:
+        st.session_state.workspace_file_ids = ()
+
+    # Large dataset mode: `df` is a DuckDB/Parquet-backed LargeDataset
+    if "large_dataset_mode" not in st.session_state:
+        st.session_state.large_dataset_mode = False
+
+    # Answer repeated questions from the local LLM response cache
+    if "llm_cache_enabled" not in st.session_state:
+        st.session_state.llm_cache_enabled = True
+
+    # Parquet exports of capped SQL results: {message key: path}
+    if "sql_exports" not in st.session_state:
+        st.session_state.sql_exports = {}
+
+    # SQL mode: answer aggregate queries from the pre-aggregated rollup when possible
+    if "rollups_enabled" not in st.session_state:
+        st.session_state.rollups_enabled = True
+
+    # Queries the rollup answered: [{"sql", "rewritten_sql"}], newest last
+    if "rollup_log" not in st.session_state:
+        st.session_state.rollup_log = []
+
+    # Python mode on big frames: answer from a sample first, then from every row
+    if "progressive_enabled" not in st.session_state:
+        st.session_state.progressive_enabled = True
+
+    # Full-data runs still going in the background: {run id: BackgroundRun}
+    if "background_runs" not in st.session_state:
+        st.session_state.background_runs = {}
+
+    # Finished tracing spans per question/upload, for the performance panel
+    if "traces" not in st.session_state:
+        st.session_state.traces = deque(maxlen=TRACE_HISTORY)
+
+    if "show_performance_panel" not in st.session_state:
+        st.session_state.show_performance_panel = False
+
     # SQL / Python engine toggle
     if "analysis_engine" not in st.session_state:
         st.session_state.analysis_engine = "Python"
\ No newline at end of file
@@ -0,0 +1,182 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+from core.config import TRACE_EXPORT_PATH, TRACE_EXPORT_FORMAT
+
+# (trace, id of the span new spans should hang under)
+_current = contextvars.ContextVar("ask_csv_trace", default=None)
+_export_lock = threading.Lock()
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class Span:
+    """One timed stage. Attributes can be added while it runs with `set`."""
+
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._rss = _rss_bytes()
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self):
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def end(self, error=None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status = "error"
+            self.attributes["error.type"] = type(error).__name__
+        rss = _rss_bytes()
+        if rss is not None and self._rss is not None:
+            self.attributes["memory.rss_delta_mb"] = round((rss - self._rss) / 1024 / 1024, 2)
+        if self.trace is not None:
+            self.trace.spans.append(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id if self.trace is not None else None,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+
+class Trace:
+    """All spans recorded for one question (or one upload)."""
+
+    def __init__(self, name, attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = dict(attributes)
+        self.spans = []
+
+    @property
+    def root(self):
+        return next((s for s in self.spans if s.parent_id is None), None)
+
+    def to_dicts(self):
+        return [span.to_dict() for span in sorted(self.spans, key=lambda s: s.start_ns)]
+
+
+def start_span(name, **attributes):
+    """
+    Start a span under the current one without making it current, for stages
+    that yield (generators) and so can't hold the context. Call `.end()`.
+    """
+    state = _current.get()
+    trace, parent_id = state if state is not None else (None, None)
+    return Span(trace, name, parent_id, attributes)
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Time a stage; spans opened inside it become its children."""
+    current = start_span(name, **attributes)
+    token = _current.set((current.trace, current.span_id)) if current.trace is not None else None
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    finally:
+        if token is not None:
+            _current.reset(token)
+        current.end()
+
+
+@contextlib.contextmanager
+def trace(name, sink=None, **attributes):
+    """Root of a trace. Finished traces are appended to `sink` and exported."""
+    new_trace = Trace(name, attributes)
+    token = _current.set((new_trace, None))
+    try:
+        with span(name, **attributes) as root:
+            yield root
+    finally:
+        _current.reset(token)
+        if sink is not None:
+            sink.append(new_trace)
+        if TRACE_EXPORT_PATH:
+            export_traces([new_trace], TRACE_EXPORT_PATH, TRACE_EXPORT_FORMAT)
+
+
+# ---- Export ----
+
+def to_jsonl(traces):
+    """One JSON object per span."""
+    return "".join(json.dumps(record, default=str) + "\n" for t in traces for record in t.to_dicts())
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(traces):
+    """OTLP/JSON `ExportTraceServiceRequest`, as read by OpenTelemetry collectors."""
+    spans = []
+    for t in traces:
+        for s in t.spans:
+            record = {
+                "traceId": t.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                "status": {"code": 2 if s.status == "error" else 1}
+            }
+            if s.parent_id is not None:
+                record["parentSpanId"] = s.parent_id
+            spans.append(record)
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "ask-your-csv"}}]},
+            "scopeSpans": [{"scope": {"name": "core.tracing"}, "spans": spans}]
+        }]
+    }
+
+
+def export_traces(traces, path, fmt="jsonl"):
+    """Append to a file: JSONL spans, or one OTLP/JSON request per line (the OTel file exporter layout)."""
+    payload = to_jsonl(traces) if fmt == "jsonl" else json.dumps(to_otlp(traces)) + "\n"
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _export_lock, open(path, "a") as f:
+        f.write(payload)
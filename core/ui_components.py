@@ -1,11 +1,143 @@
+import json
+import os
+
+import pandas as pd
 import streamlit as st
+from core.progressive import output_from_payload
+from core.results import StoredResult, unique_names
+from core.sql_engine import export_sql_parquet
+from core.state import current_session_id
+from core.tracing import to_jsonl, to_otlp
+from core.workspace import workspace_fingerprint, workspace_tables
+
+
+def render_result(result, page_key=None):
+    """Show a result; tables are shown one page at a time with a row count."""
+    if not isinstance(result, StoredResult):
+        st.write(result)
+        return
+
+    page = 0
+    if page_key is not None and result.num_pages > 1:
+        page = st.number_input(
+            f"Page (of {result.num_pages})", min_value=1, max_value=result.num_pages, key=page_key
+        ) - 1
+
+    frame = result.page(page)
+    if frame.columns.has_duplicates:
+        # st.dataframe goes through Arrow as well, which needs unique column names
+        frame.columns = unique_names([str(c) for c in frame.columns])
+    st.dataframe(frame, width="stretch")
+
+    start, end = result.page_bounds(page)
+    if result.num_rows > end - start:
+        st.caption(f"Showing rows {start + 1:,}–{end:,} of {result.num_rows:,}")
+    if result.total_rows > result.num_rows:
+        st.caption(
+            f"Showing {result.num_rows:,} of {result.total_rows:,} rows. "
+            "Add filters or an aggregation to narrow it down, or export the full result."
+        )
+
+
+def render_sql_export(sql, fingerprint, key):
+    """Offer the full result of a capped SQL query as a Parquet download."""
+    if fingerprint != workspace_fingerprint():
+        # The data changed since this query ran
+        return
+
+    path = st.session_state.sql_exports.get(key)
+    if path is None or not os.path.exists(path):
+        if not st.button("📦 Export full result to Parquet", key=f"{key}_export"):
+            return
+        try:
+            with st.spinner("Writing Parquet..."):
+                path = export_sql_parquet(
+                    st.session_state.df,
+                    sql,
+                    fingerprint=fingerprint,
+                    session_id=current_session_id(),
+                    tables=workspace_tables()
+                )
+        except Exception as e:
+            st.error(str(e))
+            return
+        st.session_state.sql_exports[key] = path
+
+    with open(path, "rb") as f:
+        st.download_button(
+            "⬇️ Download full result (Parquet)",
+            f,
+            file_name="query_result.parquet",
+            mime="application/vnd.apache.parquet",
+            key=f"{key}_download"
+        )
+
+
+def render_output(output, page_key=None):
+    """Printed text, result and chart of one code block, with a badge if it ran on a sample."""
+    if output.get("sampled"):
+        sampled = output["sampled"]
+        strata = f", stratified by {', '.join(sampled['columns'])}" if sampled["columns"] else ""
+        st.caption(f"🧪 Sampled preview: {sampled['rows']:,} of {sampled['total']:,} rows{strata}")
+    if output.get("full_run"):
+        st.caption(f"Full-data run {output['full_run']}; the sampled preview is kept.")
+
+    if output.get("printed"):
+        st.write(output["printed"])
+    if output.get("result") is not None:
+        render_result(output["result"], page_key=page_key)
+    if output.get("figure"):
+        png = st.session_state.figure_store.load(output["figure"])
+        if png is not None:
+            st.image(png)
+
+
+@st.fragment(run_every=1.0)
+def render_background_run(run_id):
+    """Progress of a full-data run; once it finishes, its result replaces the sampled preview."""
+    run = st.session_state.background_runs.get(run_id)
+    if run is None:
+        return
+
+    if not run.done():
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.caption(f"⏳ Running on all {run.total_rows:,} rows ({run.elapsed:.0f}s)...")
+        with col2:
+            if st.button("Cancel", key=f"cancel_{run_id}"):
+                run.cancel()
+        return
+
+    if run.message_index is None:
+        # The reply is still streaming; it is recorded at the end of the run
+        return
+
+    del st.session_state.background_runs[run_id]
+    message = st.session_state.messages[run.message_index]
+    error = run.payload["error"]
+    if error is None:
+        output = output_from_payload(run.payload, st.session_state.figure_store)
+    else:
+        output = {key: value for key, value in message["output"].items() if key != "pending"}
+        output["full_run"] = "cancelled" if error["type"] == "CancelledError" else f"failed ({error['type']})"
+    st.session_state.messages[run.message_index] = dict(message, output=output)
+    st.rerun()
+
 
 def render_chat_history():
-    for msg in st.session_state.messages:
+    for i, msg in enumerate(st.session_state.messages):
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
-            if "figure" in msg:
-                st.pyplot(msg["figure"])
+
+            output = msg.get("output")
+            if isinstance(output, dict):
+                render_output(output, page_key=f"result_page_{i}")
+                if output.get("pending"):
+                    render_background_run(output["pending"])
+            elif output is not None:
+                render_result(output, page_key=f"result_page_{i}")
+                if msg.get("sql") and isinstance(output, StoredResult) and output.total_rows > output.num_rows:
+                    render_sql_export(msg["sql"], msg.get("fingerprint"), key=f"sql_{i}")
 
 
 def show_data_health_report():
@@ -48,6 +180,57 @@ def show_data_health_report():
                 )
 
 
+def _trace_rows(trace):
+    """Spans in start order, indented under their parents."""
+    spans = sorted(trace.spans, key=lambda s: s.start_ns)
+    depth = {}
+    total = trace.root.duration_ms if trace.root is not None else 0
+
+    rows = []
+    for s in spans:
+        depth[s.span_id] = depth.get(s.parent_id, -1) + 1
+        rows.append({
+            "Stage": "· " * depth[s.span_id] + s.name,
+            "ms": round(s.duration_ms, 1),
+            "% of total": round(s.duration_ms / total * 100, 1) if total else None,
+            "Details": ", ".join(f"{k}={v}" for k, v in s.attributes.items() if k != "question")
+        })
+    return pd.DataFrame(rows)
+
+
+def show_performance_panel():
+    with st.sidebar:
+        st.markdown("---")
+        st.session_state.show_performance_panel = st.checkbox(
+            "⏱️ Show performance panel",
+            value=st.session_state.show_performance_panel,
+            help="Time spent per stage (upload, prompt, LLM, SQL, code, render) for recent questions"
+        )
+        if not st.session_state.show_performance_panel:
+            return
+
+        traces = list(st.session_state.traces)
+        if not traces:
+            st.caption("Ask a question to see where the time goes.")
+            return
+
+        for trace in reversed(traces):
+            root = trace.root
+            label = trace.attributes.get("question") or trace.attributes.get("file") or ""
+            if len(label) > 40:
+                label = label[:40] + "…"
+            with st.expander(f"{trace.name}: {label} ({root.duration_ms / 1000:.2f}s)"):
+                st.dataframe(_trace_rows(trace), hide_index=True, width="stretch")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("JSONL", to_jsonl(traces), file_name="traces.jsonl", mime="application/jsonl")
+        with col2:
+            st.download_button(
+                "OTLP JSON", json.dumps(to_otlp(traces)), file_name="traces.otlp.json", mime="application/json"
+            )
+
+
 def show_no_data_screen():
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
@@ -0,0 +1,440 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+import traceback
+import uuid
+import warnings
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+
+from core.config import (
+    CODE_WORKERS,
+    CODE_TIMEOUT_SECONDS,
+    CODE_MEMORY_LIMIT_MB,
+    LARGE_DATASET_MAX_ROWS,
+    SHARED_DATASET_DIR
+)
+from core.duckdb_utils import SLOT_THREADS, connect, quote_identifier, quote_literal
+from core.figure_store import render_png
+from core.large_dataset import LargeDataset
+from core.results import encode_value
+
+# Unused dataset exports kept for reuse (exports some job still needs are never removed)
+MAX_SHARED_DATASETS = 4
+# Frames kept loaded inside each worker: each one is a private pandas copy counted against the RSS cap
+MAX_WORKER_FRAMES = 1
+
+
+# ---------------------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------------------
+
+def _group_observed_only():
+    """
+    Make categorical columns from ingestion behave like the strings they replace.
+    pandas groups (and counts) over every category, so a filtered frame would give
+    zero/NaN rows for values that were filtered out; generated code is written for
+    object columns, so default to `observed=True` and drop unobserved categories
+    from `value_counts`. Only ever called inside a worker process.
+    """
+    def observed_default(method):
+        def wrapper(*args, **kwargs):
+            kwargs.setdefault("observed", True)
+            return method(*args, **kwargs)
+        return wrapper
+
+    pd.DataFrame.groupby = observed_default(pd.DataFrame.groupby)
+    pd.Series.groupby = observed_default(pd.Series.groupby)
+    pd.DataFrame.pivot_table = observed_default(pd.DataFrame.pivot_table)
+    pd.pivot_table = observed_default(pd.pivot_table)
+
+    value_counts = pd.Series.value_counts
+
+    def observed_value_counts(self, *args, **kwargs):
+        counts = value_counts(self, *args, **kwargs)
+        if isinstance(self.dtype, pd.CategoricalDtype):
+            counts = counts[counts > 0]
+        return counts
+
+    pd.Series.value_counts = observed_value_counts
+
+
+def _load_frame(ref, code, frames):
+    """
+    The `df` a job runs on. Exports are memory-mapped Arrow files, but pandas needs
+    its own copy of most columns, so a worker keeps at most MAX_WORKER_FRAMES
+    frames. The conversion releases each Arrow column as soon as it is converted
+    (`self_destruct`), so the copy is never held twice.
+    """
+    if ref is None:
+        return None, []
+
+    if ref["kind"] == "large":
+        # Pull only what this block needs, and only if it uses `df`
+        if not re.search(r"\bdf\b", code):
+            return None, []
+        dataset = LargeDataset(ref["path"])
+        notes = []
+        if dataset.is_sampled():
+            notes.append(f"Running on a {LARGE_DATASET_MAX_ROWS:,}-row sample of {len(dataset):,} rows.")
+        return dataset.frame_for_code(code), notes
+
+    key = ref["key"]
+    if key not in frames:
+        # Drop the old frame first, so two are never resident at once
+        while len(frames) >= MAX_WORKER_FRAMES:
+            frames.popitem(last=False)
+
+        if ref["kind"] == "ipc":
+            # Memory-mapped: nothing is pickled, and the file's pages are shared by every worker
+            with pa.memory_map(ref["path"]) as source:
+                table = pa.ipc.open_file(source).read_all()
+                frames[key] = table.to_pandas(split_blocks=True, self_destruct=True)
+                del table
+        else:
+            frames[key] = pd.read_pickle(ref["path"])
+
+    frames.move_to_end(key)
+    return frames[key], []
+
+
+def _make_query(df, ref):
+    """`query(sql)` for generated code: DuckDB over `df` and the workspace tables."""
+    def query(sql):
+        con = connect()
+        try:
+            if ref is not None and ref["kind"] == "large":
+                con.execute(f"CREATE VIEW df AS SELECT * FROM read_parquet({quote_literal(ref['path'])})")
+            elif df is not None:
+                con.register("df", df)
+            for name, path in (ref or {}).get("tables", {}).items():
+                con.execute(
+                    f"CREATE VIEW {quote_identifier(name)} AS SELECT * FROM read_parquet({quote_literal(path)})"
+                )
+            return con.execute(sql).fetchdf()
+        finally:
+            con.close()
+
+    return query
+
+
+def _execute(job, frames):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    code = job["code"]
+    payload = {"printed": "", "result": None, "figure_png": None,
+               "warnings": [], "notes": [], "error": None, "timings": {}}
+
+    try:
+        df, payload["notes"] = _load_frame(job["dataset"], code, frames)
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+
+            # Prepare matplotlib
+            plt.close("all")
+            plt.figure(figsize=(10, 6))
+
+            # Prepare execution environment
+            exec_globals = {"df": df, "pd": pd, "plt": plt, "sns": sns,
+                            "query": _make_query(df, job["dataset"])}
+            local_vars = {}
+            started = time.perf_counter()
+
+            # ---- Capture print() output (per process, so no cross-session races) ----
+            stdout_buffer = io.StringIO()
+            with contextlib.redirect_stdout(stdout_buffer):
+                exec(code, exec_globals, local_vars)
+            payload["printed"] = stdout_buffer.getvalue().strip()
+            payload["timings"]["exec_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+            # ---- Detect last expression value ----
+            last_line = code.split("\n")[-1].strip()
+            value = exec_globals.get(last_line, local_vars.get(last_line))
+            started = time.perf_counter()
+            payload["result"] = encode_value(value)
+            payload["timings"]["serialize_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+            # ---- Plot handling ----
+            fig = plt.gcf()
+            if fig.get_axes():
+                started = time.perf_counter()
+                payload["figure_png"] = render_png(fig)
+                payload["timings"]["figure_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            plt.close("all")
+
+        payload["warnings"] = [str(warning.message) for warning in w]
+
+    except Exception as e:
+        payload["error"] = {
+            "type": type(e).__name__,
+            "message": str(e),
+            "traceback": traceback.format_exc(limit=5)
+        }
+
+    return payload
+
+
+def _worker_main(conn):
+    import matplotlib
+    matplotlib.use("Agg")
+
+    # A code block holds one scheduler slot, so it gets one slot's share of the cores
+    pa.set_cpu_count(SLOT_THREADS)
+    _group_observed_only()
+
+    frames = OrderedDict()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        conn.send(_execute(job, frames))
+
+
+# ---------------------------------------------------------------------------
+# App side
+# ---------------------------------------------------------------------------
+
+def error_payload(error_type, message):
+    return {"printed": "", "result": None, "figure_png": None, "warnings": [], "notes": [],
+            "error": {"type": error_type, "message": message, "traceback": ""}, "timings": {}}
+
+
+class SharedDataset(dict):
+    """
+    A session's hold on a dataset export: the reference workers load it by
+    (kind, key, path). The file is kept until every handle is gone: jobs keep
+    theirs until they finish, so eviction never deletes a file a queued job needs.
+    """
+
+    def __init__(self, pool, ref):
+        super().__init__(ref)
+        self._release = weakref.finalize(self, pool._release_export, ref["key"])
+
+
+class CodeJob:
+    """Handle for one submitted code block."""
+
+    def __init__(self, code, dataset_ref):
+        self.id = uuid.uuid4().hex
+        self.code = code
+        self.dataset_ref = dataset_ref
+        self.future = Future()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def rss_bytes(self):
+        # Linux only; elsewhere the memory cap is simply not enforced
+        try:
+            with open(f"/proc/{self.process.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    Process pool for generated code: each block runs in a worker with a
+    wall-clock timeout, an RSS cap and cancellation. A worker that has to be
+    stopped is killed and replaced.
+    """
+
+    def __init__(self, size=CODE_WORKERS, timeout=CODE_TIMEOUT_SECONDS,
+                 memory_limit_mb=CODE_MEMORY_LIMIT_MB):
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(None)  # started lazily
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="code-worker")
+
+        self._shared = OrderedDict()  # key -> {"ref", "refs"}, least recently shared first
+        self._exporting = {}          # key -> Event set once its export is written (or failed)
+        self._shared_lock = threading.Lock()
+
+    # ---- Dataset sharing ----
+
+    def share_dataset(self, key, df):
+        """Export a dataset once per fingerprint so workers can map it; returns a handle holding the export."""
+        if df is None:
+            return None
+        if isinstance(df, LargeDataset):
+            return {"kind": "large", "key": key, "path": df.path}
+
+        while True:
+            with self._shared_lock:
+                entry = self._shared.get(key)
+                if entry is not None:
+                    self._shared.move_to_end(key)
+                    entry["refs"] += 1
+                    return SharedDataset(self, entry["ref"])
+
+                exporting = self._exporting.get(key)
+                owner = exporting is None
+                if owner:
+                    exporting = self._exporting[key] = threading.Event()
+
+            if not owner:
+                # Another session is writing the same dataset; use its export
+                exporting.wait()
+                continue
+
+            # Written outside the lock: other sessions' jobs keep starting meanwhile
+            try:
+                ref = self._export(key, df)
+                with self._shared_lock:
+                    self._shared[key] = {"ref": ref, "refs": 1}
+                    self._evict_exports()
+                return SharedDataset(self, ref)
+            finally:
+                with self._shared_lock:
+                    self._exporting.pop(key, None)
+                exporting.set()
+
+    def _export(self, key, df):
+        os.makedirs(SHARED_DATASET_DIR, exist_ok=True)
+        path = os.path.join(SHARED_DATASET_DIR, f"{key}.arrow")
+        try:
+            table = pa.Table.from_pandas(df)
+            with pa.OSFile(path + ".tmp", "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            ref = {"kind": "ipc", "key": key, "path": path}
+        except (pa.ArrowException, TypeError, ValueError):
+            # Columns Arrow can't encode (mixed object types) -> pickle file instead
+            path = os.path.join(SHARED_DATASET_DIR, f"{key}.pkl")
+            df.to_pickle(path + ".tmp")
+            ref = {"kind": "pickle", "key": key, "path": path}
+        os.replace(ref["path"] + ".tmp", ref["path"])
+        return ref
+
+    def _release_export(self, key):
+        with self._shared_lock:
+            entry = self._shared.get(key)
+            if entry is not None:
+                entry["refs"] -= 1
+            self._evict_exports()
+
+    def _evict_exports(self):
+        # Only exports no handle refers to are removed, least recently shared first
+        unused = [key for key, entry in self._shared.items() if entry["refs"] <= 0]
+        for key in unused[:max(0, len(self._shared) - MAX_SHARED_DATASETS)]:
+            old = self._shared.pop(key)
+            with contextlib.suppress(OSError):
+                os.remove(old["ref"]["path"])
+
+    # ---- Execution ----
+
+    def submit(self, code, dataset_ref):
+        job = CodeJob(code, dataset_ref)
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        worker = self._idle.get()
+        try:
+            if job.cancelled:
+                job.future.set_result(error_payload("CancelledError", "Execution was cancelled."))
+                return
+
+            if worker is None or not worker.alive():
+                worker = _Worker(self._ctx)
+
+            dataset = dict(job.dataset_ref) if job.dataset_ref is not None else None
+            worker.conn.send({"code": job.code, "dataset": dataset})
+            payload, stopped = self._wait(worker, job)
+            if stopped:
+                worker = None
+            job.future.set_result(payload)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_result(error_payload(type(e).__name__, str(e)))
+            if worker is not None:
+                worker.kill()
+            worker = None
+        finally:
+            self._idle.put(worker)
+
+    def _wait(self, worker, job):
+        deadline = time.monotonic() + self.timeout
+
+        while not worker.conn.poll(0.1):
+            if not worker.alive():
+                return error_payload("WorkerCrashed", "The worker process exited unexpectedly."), True
+
+            stop = None
+            if job.cancelled:
+                stop = ("CancelledError", "Execution was cancelled.")
+            elif time.monotonic() > deadline:
+                stop = ("TimeoutError", f"Execution took longer than {self.timeout:.0f}s and was stopped.")
+            elif self.memory_limit and worker.rss_bytes() > self.memory_limit:
+                stop = ("MemoryError",
+                        f"Execution used more than {self.memory_limit / 1024 / 1024:.0f} MB and was stopped.")
+
+            if stop is not None:
+                worker.kill()
+                return error_payload(*stop), True
+
+        try:
+            return worker.conn.recv(), False
+        except EOFError:
+            worker.kill()
+            return error_payload("WorkerCrashed", "The worker process exited unexpectedly."), True
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """Process-wide pool shared by every session."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+        return _pool
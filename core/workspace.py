@@ -0,0 +1,66 @@
+import hashlib
+import os
+import re
+
+import streamlit as st
+
+from core.config import PROMPT_CONTEXT_TOKENS
+from core.duckdb_utils import quote_identifier
+from core.prompt_context import get_schema_digest
+
+# The first upload is always `df`; extra files become views named after the file
+PRIMARY_TABLE = "df"
+_NON_IDENTIFIER = re.compile(r"[^0-9a-zA-Z_]+")
+
+
+def table_name_for(filename, taken):
+    base = _NON_IDENTIFIER.sub("_", os.path.splitext(filename)[0]).strip("_").lower() or "table"
+    if base[0].isdigit():
+        base = "t_" + base
+
+    name, n = base, 2
+    while name in taken:
+        name = f"{base}_{n}"
+        n += 1
+    return name
+
+
+def workspace_tables():
+    """Extra tables of the session: {name: LargeDataset}."""
+    return {name: table["dataset"] for name, table in st.session_state.workspace_tables.items()}
+
+
+def workspace_fingerprint():
+    """Identifies everything SQL can see: the main dataset plus the attached tables."""
+    tables = st.session_state.workspace_tables
+    if not tables:
+        return st.session_state.dataset_hash
+
+    parts = [st.session_state.dataset_hash] + [f"{name}={table['hash']}" for name, table in tables.items()]
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
+
+def build_workspace_context(kind="python"):
+    """Schema digests for `df` and every attached table, sharing one token budget."""
+    tables = st.session_state.workspace_tables
+    budget = PROMPT_CONTEXT_TOKENS // (1 + len(tables))
+
+    main = get_schema_digest(
+        st.session_state.dataset_hash,
+        st.session_state.df,
+        st.session_state.data_summary,
+        st.session_state.data_profile,
+        kind=kind,
+        budget=budget
+    )
+    if not tables:
+        return main
+
+    sections = [f"Table {PRIMARY_TABLE}:\n{main}"]
+    for name, table in tables.items():
+        digest = get_schema_digest(
+            table["hash"], table["dataset"], table["summary"], table["profile"], kind=kind, budget=budget
+        )
+        label = quote_identifier(name) if kind == "sql" else name
+        sections.append(f"Table {label} (from {table['file']}):\n{digest}")
+    return "\n\n".join(sections)
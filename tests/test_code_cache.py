@@ -0,0 +1,46 @@
+import pandas as pd
+
+from core.code_cache import CodeResultCache, code_cache_key
+from core.large_dataset import LargeDataset
+from core.worker_pool import error_payload
+
+FRAME = pd.DataFrame({"a": [1, 2, 3]})
+
+
+def payload(printed="6"):
+    return dict(error_payload("x", "y"), printed=printed, error=None)
+
+
+def test_formatting_and_comments_do_not_change_the_key():
+    assert code_cache_key("print(df['a'].sum())", "h", FRAME) == \
+        code_cache_key("# total\nprint( df['a'].sum() )\n", "h", FRAME)
+
+
+def test_non_deterministic_code_is_not_cached():
+    assert code_cache_key("df.sample(3)", "h", FRAME) is None
+    assert code_cache_key("import numpy as np\nnp.random.rand(3)", "h", FRAME) is None
+    assert code_cache_key("pd.Timestamp.now()", "h", FRAME) is None
+    assert code_cache_key("df.sample(3, random_state=1)", "h", FRAME) is not None
+
+
+def test_large_mode_sample_is_kept_apart_from_the_full_frame(tmp_path, monkeypatch):
+    path = str(tmp_path / "data.parquet")
+    FRAME.to_parquet(path)
+    large = LargeDataset(path)
+    monkeypatch.setattr(LargeDataset, "is_sampled", lambda self: True)
+
+    assert code_cache_key("df['a'].sum()", "h", large) != code_cache_key("df['a'].sum()", "h", FRAME)
+
+
+def test_cache_evicts_least_recently_used_and_skips_failures():
+    cache = CodeResultCache(max_bytes=2)
+    cache.put("k1", payload())
+    cache.put("k2", payload())
+    cache.get("k1")
+    cache.put("k3", payload())
+
+    assert cache.get("k2") is None
+    assert cache.get("k1") is not None and cache.get("k3") is not None
+
+    cache.put("k4", error_payload("TimeoutError", "too slow"))
+    assert cache.get("k4") is None
@@ -0,0 +1,55 @@
+import sqlite3
+
+from core import conversation_store
+from core.config import CONVERSATION_RETENTION_SECONDS
+from core.conversation_store import ConversationStore
+
+
+def age(path, session, seconds):
+    with sqlite3.connect(path) as con:
+        con.execute("UPDATE messages SET created = created - ? WHERE session = ?", (seconds, session))
+        con.execute("UPDATE sessions SET last_seen = last_seen - ? WHERE session = ?", (seconds, session))
+
+
+def rows(path, session):
+    with sqlite3.connect(path) as con:
+        return con.execute("SELECT count(*) FROM messages WHERE session = ?", (session,)).fetchone()[0]
+
+
+def test_open_session_outlives_retention(tmp_path):
+    path = str(tmp_path / "conversations.sqlite")
+    live = ConversationStore(path=path, window=1, page_size=1)
+    live.append({"role": "user", "content": "first"})
+    live.append({"role": "user", "content": "second"})
+    age(path, live.session, CONVERSATION_RETENTION_SECONDS + 60)
+
+    # A new session sweeps expired rows; the open tab's history must survive
+    ConversationStore(path=path)
+
+    assert [m["content"] for m in live] == ["first", "second"]
+
+
+def test_unused_session_left_behind_expires(tmp_path, monkeypatch):
+    path = str(tmp_path / "conversations.sqlite")
+    stale = ConversationStore(path=path)
+    stale.append({"role": "user", "content": "old"})
+    age(path, stale.session, CONVERSATION_RETENTION_SECONDS + 60)
+    # As if the server had been killed: the session is no longer open anywhere
+    monkeypatch.setattr(conversation_store, "_live_sessions", set())
+
+    ConversationStore(path=path)
+
+    assert rows(path, stale.session) == 0
+
+
+def test_missing_rows_do_not_break_reading(tmp_path):
+    path = str(tmp_path / "conversations.sqlite")
+    store = ConversationStore(path=path, window=1, page_size=1)
+    store.append({"role": "user", "content": "first"})
+    store.append({"role": "user", "content": "second"})
+    with sqlite3.connect(path) as con:
+        con.execute("DELETE FROM messages WHERE session = ? AND seq = 0", (store.session,))
+
+    assert store[0] == conversation_store.MISSING_MESSAGE
+    assert store[1]["content"] == "second"
+    assert len(list(store)) == 2  # walking the whole history still works
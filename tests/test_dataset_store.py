@@ -0,0 +1,54 @@
+import gc
+import threading
+
+import pandas as pd
+
+from core.dataset_store import DatasetStore
+
+
+def loader(rows):
+    frame = pd.DataFrame({"a": range(rows)})
+    return lambda: (frame, {}, pd.DataFrame({"Column": ["a"]}), {})
+
+
+def test_release_while_lock_is_held_does_not_deadlock():
+    store = DatasetStore()
+    ref = store.acquire("k", loader(3))
+
+    # What a GC-triggered finalizer inside acquire() amounts to
+    def release_under_lock():
+        with store._lock:
+            ref.release()
+
+    thread = threading.Thread(target=release_under_lock, daemon=True)
+    thread.start()
+    thread.join(timeout=2)
+
+    assert not thread.is_alive()
+    assert store.stats()["referenced"] == 0
+
+
+def test_unreferenced_datasets_are_evicted_over_budget():
+    store = DatasetStore(max_bytes=0)
+    kept = store.acquire("kept", loader(10))
+    dropped = store.acquire("dropped", loader(10))
+
+    del dropped
+    gc.collect()
+
+    stats = store.stats()
+    assert stats["entries"] == 1 and stats["referenced"] == 1
+    assert kept.entry.df is not None
+
+
+def test_same_key_is_loaded_once():
+    store = DatasetStore()
+    calls = []
+
+    def load():
+        calls.append(1)
+        return loader(3)()
+
+    first, second = store.acquire("k", load), store.acquire("k", load)
+    assert len(calls) == 1 and first.entry is second.entry
+    assert store.stats()["hits"] == 1
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pandas as pd
+
+from core import duckdb_manager
+from core.duckdb_manager import ConnectionManager
+
+FRAME = pd.DataFrame({"a": [1, 2, 3]})
+
+
+def slow_connection(monkeypatch, seconds):
+    original = duckdb_manager.SessionConnection.__init__
+    builds = []
+
+    def init(self, *args, **kwargs):
+        builds.append(args[0])
+        time.sleep(seconds)
+        original(self, *args, **kwargs)
+
+    monkeypatch.setattr(duckdb_manager.SessionConnection, "__init__", init)
+    return builds
+
+
+def test_loading_one_session_does_not_block_others(monkeypatch):
+    manager = ConnectionManager()
+    manager.get("fast", "f", FRAME)
+    slow_connection(monkeypatch, 1.0)
+
+    loader = threading.Thread(target=manager.get, args=("slow", "s", FRAME))
+    loader.start()
+    time.sleep(0.1)
+
+    started = time.monotonic()
+    assert manager.peek("fast") is not None
+    assert manager.get("fast", "f", FRAME) is manager.peek("fast")
+    assert time.monotonic() - started < 0.5
+
+    loader.join()
+    assert manager.peek("slow") is not None
+
+
+def test_concurrent_gets_build_the_session_connection_once(monkeypatch):
+    manager = ConnectionManager()
+    builds = slow_connection(monkeypatch, 0.3)
+    connections = []
+
+    threads = [threading.Thread(target=lambda: connections.append(manager.get("s", "f", FRAME))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert builds == ["f"]
+    assert all(conn is connections[0] for conn in connections)
+
+
+def test_idle_connections_are_swept_without_new_queries():
+    manager = ConnectionManager(idle_ttl=0)
+    manager.get("s", "f", FRAME)
+    time.sleep(0.01)
+
+    assert manager.peek("s") is None
@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+import pytest
+
+from core import worker_pool
+from core.ingest import read_csv_lean
+from core.worker_pool import WorkerPool
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_data1.csv")
+
+FILTERED = [
+    'result = df[df["Customer Region"] == "West"].groupby("Customer Region")["Total Amount"].sum()',
+    'result = df[df["Payment Method"] == "PayPal"]["Product Category"].value_counts()',
+    'result = df[df["Quantity"] >= 4].groupby(["Customer Region", "Payment Method"])["Unit Price"].mean()',
+    'result = df[df["Customer Region"] == "South"].pivot_table('
+    'index="Product Category", values="Quantity", aggfunc="sum")',
+]
+
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(worker_pool, "SHARED_DATASET_DIR", str(tmp_path_factory.mktemp("shared")))
+        yield WorkerPool(size=1, timeout=60)
+
+
+def test_ingest_makes_low_cardinality_text_categorical():
+    with open(SAMPLE, "rb") as f:
+        df, stats = read_csv_lean(f)
+
+    assert "Customer Region" in stats["categorical_columns"]
+    assert isinstance(df["Customer Region"].dtype, pd.CategoricalDtype)
+
+
+@pytest.mark.parametrize("code", FILTERED)
+def test_filtered_grouping_matches_plain_read_csv(pool, code):
+    with open(SAMPLE, "rb") as f:
+        lean, _ = read_csv_lean(f)
+    plain = pd.read_csv(SAMPLE)
+
+    printed = []
+    for key, df in (("lean", lean), ("plain", plain)):
+        job = pool.submit(code + "\nprint(result.round(2).to_dict())", pool.share_dataset(key, df))
+        payload = job.result(timeout=60)
+        assert payload["error"] is None
+        assert not payload["warnings"]
+        printed.append(payload["printed"])
+
+    lean_result, plain_result = printed
+    assert lean_result == plain_result
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from core.large_dataset import LargeDataset, projected_columns
+
+COLUMNS = ["Customer Region", "Quantity", "Unit Price", "Total Amount"]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    frame = pd.read_csv("sample_data1.csv")
+    path = str(tmp_path / "data.parquet")
+    frame.to_parquet(path)
+    return LargeDataset(path), frame
+
+
+def run(code, df):
+    scope = {"df": df, "pd": pd}
+    exec(f"result = {code}", scope)
+    return scope["result"]
+
+
+@pytest.mark.parametrize("code", [
+    "df.groupby('Customer Region').sum(numeric_only=True)",
+    "df.groupby('Customer Region').mean(numeric_only=True)",
+    "df[df['Quantity'] > 3].mean(numeric_only=True)",
+    "df.Quantity.sum() + df['Unit Price'].sum()",
+])
+def test_frame_for_code_matches_full_frame(dataset, code):
+    large, frame = dataset
+    expected = run(code, frame)
+    actual = run(code, large.frame_for_code(code))
+
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(actual, expected)
+    elif isinstance(expected, pd.Series):
+        pd.testing.assert_series_equal(actual, expected)
+    else:
+        assert actual == pytest.approx(expected)
+
+
+def test_whole_frame_uses_are_not_projected():
+    assert projected_columns("df.groupby('Customer Region').sum()", COLUMNS) is None
+    assert projected_columns("df[df['Quantity'] > 3].mean()", COLUMNS) is None
+    assert projected_columns("print(len(df))", COLUMNS) is None
+    assert projected_columns("df['Total'] = df['Quantity'] * 2", COLUMNS) is None
+
+
+def test_single_column_uses_are_projected():
+    code = "df.Quantity.sum() + df['Unit Price'].sum()"
+    assert projected_columns(code, COLUMNS) == ["Quantity", "Unit Price"]
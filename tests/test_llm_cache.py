@@ -0,0 +1,85 @@
+import types
+
+import pytest
+import streamlit as st
+
+from core import llm_client
+from core.llm_cache import LLMResponseCache, cache_key
+from core.llm_client import generate_llm_response, stream_llm_response
+
+
+class StubClient:
+    """Stands in for the OpenAI client: counts requests and replies with canned text."""
+
+    def __init__(self, reply="SELECT 1"):
+        self.reply = reply
+        self.calls = 0
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return (
+                types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=part))])
+                for part in (self.reply[:3], self.reply[3:])
+            )
+        message = types.SimpleNamespace(content=self.reply)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = LLMResponseCache(path=str(tmp_path / "llm_cache.sqlite"))
+    monkeypatch.setattr(llm_client, "response_cache", cache)
+    st.session_state.messages = []
+    return cache
+
+
+def test_miss_calls_the_model_then_hit_reuses_the_reply(cache):
+    client = StubClient()
+
+    assert generate_llm_response(client, "system", "How many rows?") == "SELECT 1"
+    assert generate_llm_response(client, "system", "How many rows?") == "SELECT 1"
+    assert client.calls == 1
+
+
+def test_streamed_reply_is_cached_whole(cache):
+    client = StubClient()
+
+    assert list(stream_llm_response(client, "system", "q")) == ["SEL", "ECT 1"]
+    assert list(stream_llm_response(client, "system", "q")) == ["SELECT 1"]
+    assert client.calls == 1
+
+
+def test_use_cache_false_always_calls_the_model(cache):
+    client = StubClient()
+    generate_llm_response(client, "system", "q", use_cache=False)
+    generate_llm_response(client, "system", "q", use_cache=False)
+    assert client.calls == 2
+
+
+@pytest.mark.parametrize("change", ["system", "history", "question"])
+def test_key_changes_invalidate(cache, change):
+    client = StubClient()
+    generate_llm_response(client, "system", "q")
+
+    if change == "system":
+        generate_llm_response(client, "system (new dataset)", "q")
+    elif change == "history":
+        st.session_state.messages = [{"role": "user", "content": "earlier question"}]
+        generate_llm_response(client, "system", "q")
+    else:
+        generate_llm_response(client, "system", "another q")
+
+    assert client.calls == 2
+
+
+def test_key_ignores_surrounding_whitespace_but_not_model():
+    assert cache_key("m", "s", [], "q ") == cache_key("m", "s", [], "q")
+    assert cache_key("m", "s", [], "q") != cache_key("other", "s", [], "q")
+
+
+def test_expired_reply_is_a_miss(tmp_path):
+    cache = LLMResponseCache(path=str(tmp_path / "llm_cache.sqlite"), ttl_seconds=-1)
+    cache.put("k", "reply")
+    assert cache.get("k") is None
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+import openai
+import pytest
+
+from core import llm_transport
+from core.llm_transport import RateLimiter, ResilientLLMClient
+
+
+def ask(client, question, **kwargs):
+    return client.create(model="m", messages=[{"role": "user", "content": question}], **kwargs)
+
+
+def streamed(client, question):
+    return "".join(chunk.choices[0].delta.content for chunk in ask(client, question, stream=True))
+
+
+@pytest.fixture
+def client(fake_openai, monkeypatch):
+    monkeypatch.setattr(llm_transport, "backoff_delay", lambda attempt: 0.05)
+    return ResilientLLMClient("test-key", base_url=fake_openai.base_url, timeout=5, max_retries=2, hedge_after=0)
+
+
+def test_server_errors_are_retried(fake_openai, client):
+    fake_openai.plan["q"] = ["500", "500"]
+
+    assert ask(client, "q").choices[0].message.content == "answer to q"
+    assert fake_openai.count("q") == 3
+
+
+def test_retries_give_up_after_max_retries(fake_openai, client):
+    fake_openai.plan["q"] = ["500"] * 3
+
+    with pytest.raises(openai.InternalServerError):
+        ask(client, "q")
+    assert fake_openai.count("q") == 3
+
+
+def test_429_waits_for_retry_after(fake_openai, client):
+    fake_openai.plan["q"] = ["429"]
+
+    started = time.monotonic()
+    assert ask(client, "q").choices[0].message.content == "answer to q"
+    assert time.monotonic() - started >= 0.2
+    assert fake_openai.count("q") == 2
+
+
+def test_stream_yields_chunks_and_retries_opening(fake_openai, client):
+    fake_openai.plan["q"] = ["500"]
+
+    assert streamed(client, "q") == "answer to q "
+    assert fake_openai.count("q") == 2
+
+
+def test_each_retry_waits_for_the_rate_limiter(fake_openai, client, monkeypatch):
+    class CountingLimiter(RateLimiter):
+        acquired = 0
+
+        async def acquire(self):
+            CountingLimiter.acquired += 1
+
+    monkeypatch.setattr(llm_transport, "_rate_limiter", CountingLimiter(0))
+    fake_openai.plan["q"] = ["500", "500"]
+
+    streamed(client, "q")
+    assert CountingLimiter.acquired == 3
+
+
+def test_backoff_does_not_hold_a_concurrency_slot(fake_openai, client, monkeypatch):
+    monkeypatch.setattr(llm_transport, "_concurrency", asyncio.Semaphore(1))
+    monkeypatch.setattr(llm_transport, "backoff_delay", lambda attempt: 1.0)
+    fake_openai.plan["slow"] = ["500"]
+
+    retrying = threading.Thread(target=streamed, args=(client, "slow"))
+    retrying.start()
+    time.sleep(0.2)  # "slow" has failed once and is sleeping before its retry
+
+    started = time.monotonic()
+    assert streamed(client, "fast") == "answer to fast "
+    assert time.monotonic() - started < 0.8
+
+    retrying.join()
+    assert fake_openai.count("slow") == 2
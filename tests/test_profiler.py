@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.columnar import parquet_column_stats
+from core.dataset_cache import build_data_summary
+from core.duckdb_utils import connect, summarize_relation
+from core.large_dataset import LargeDataset, build_large_summary
+from core.profiler import profile_dataframe, profile_large_dataset, summarize_frame
+
+ROWS = 1_000_000
+
+
+@pytest.fixture(scope="module")
+def frame():
+    values = np.arange(ROWS, dtype=np.float64)
+    values[[10, 500_000, ROWS - 1]] = np.nan
+    return pd.DataFrame({"order_id": np.arange(ROWS), "amount": values})
+
+
+def assert_three_nulls(summary, profile):
+    assert summary["missing_values"] == 3
+    assert summary["stats"]["amount"]["count"] == ROWS - 3
+    assert summary["stats"]["order_id"]["count"] == ROWS
+
+    missing = dict(zip(profile["Column"], profile["Missing %"].astype(float)))
+    assert missing["amount"] > 0
+    assert missing["order_id"] == 0
+
+
+def test_few_nulls_in_a_large_frame_are_counted_exactly(frame):
+    summary_stats = summarize_frame(frame)
+
+    assert summary_stats.set_index("column_name")["null_count"].to_dict() == {"order_id": 0, "amount": 3}
+    assert_three_nulls(build_data_summary(frame, summary_stats), profile_dataframe(frame, summary_stats))
+
+
+@pytest.mark.parametrize("from_footer", [False, True])
+def test_few_nulls_in_a_large_dataset_are_counted_exactly(frame, tmp_path, from_footer):
+    path = str(tmp_path / "data.parquet")
+    frame.to_parquet(path, index=False)
+    dataset = LargeDataset(path)
+
+    con = connect()
+    try:
+        known = parquet_column_stats(path) if from_footer else None
+        summary_stats = summarize_relation(con, dataset.relation, known=known)
+    finally:
+        con.close()
+
+    assert_three_nulls(build_large_summary(dataset, summary_stats), profile_large_dataset(dataset, summary_stats))
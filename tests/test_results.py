@@ -0,0 +1,41 @@
+import pandas as pd
+
+from core.config import RESULT_PAGE_ROWS
+from core.results import StoredResult, decode_value, encode_value
+
+
+def round_trip(value):
+    stored = decode_value(encode_value(value))
+    assert isinstance(stored, StoredResult)
+    return stored
+
+
+def test_duplicate_columns_keep_their_labels():
+    df = pd.read_csv("sample_data1.csv")
+    result = pd.concat([df.describe(), df.describe()], axis=1)
+
+    stored = round_trip(result)
+
+    pd.testing.assert_frame_equal(stored.to_pandas(), result)
+    pd.testing.assert_frame_equal(stored.page(0), result)
+
+
+def test_duplicate_columns_never_clash_with_numbered_names():
+    result = pd.DataFrame([[1, 2, 3, 4]], columns=["a", "a", "a.1", 0])
+
+    frame = round_trip(result).to_pandas()
+
+    assert list(frame.columns) == ["a", "a", "a.1", "0"]
+    assert frame.iloc[0].tolist() == [1, 2, 3, 4]
+
+
+def test_duplicate_columns_on_later_pages():
+    left = pd.DataFrame({"key": range(RESULT_PAGE_ROWS + 5), "value": "x"})
+    result = left.merge(left, on="key").set_axis(["key", "value", "value"], axis=1)
+
+    stored = round_trip(result)
+
+    assert stored.num_pages == 2
+    last = stored.page(1)
+    assert list(last.columns) == ["key", "value", "value"]
+    assert last.index[0] == RESULT_PAGE_ROWS
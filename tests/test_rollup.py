@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from core.duckdb_manager import connection_manager
+from core.duckdb_utils import connect
+from core.profiler import profile_dataframe
+from core.rollup import build_rollup
+from core.sql_engine import execute_sql
+
+
+@pytest.fixture(scope="module")
+def frame():
+    df = pd.read_csv("sample_data1.csv", parse_dates=["Order Date"])
+    return pd.concat([df] * 20, ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def rollup_con(frame):
+    con = connect()
+    con.register("source", frame)
+    con.execute("CREATE TABLE df AS SELECT * FROM source")
+    rollup = build_rollup(con, profile_dataframe(frame))
+    assert rollup is not None
+    yield con, rollup
+    con.close()
+
+
+@pytest.mark.parametrize("sql", [
+    'SELECT "Customer Region", sum("Total Amount") AS total FROM df GROUP BY 1 ORDER BY 1',
+    'SELECT "Customer Region" AS r, count(*), avg(Quantity), max("Unit Price") FROM df GROUP BY r ORDER BY r',
+    "SELECT year(\"Order Date\") AS y, count(Quantity) FROM df GROUP BY y HAVING count(*) > 1 ORDER BY y",
+])
+def test_rewrite_matches_base_query(rollup_con, sql):
+    con, rollup = rollup_con
+    rewritten = rollup.rewrite(con, sql)
+    assert rewritten is not None and "__rollup" in rewritten
+    pd.testing.assert_frame_equal(con.execute(rewritten).df(), con.execute(sql).df())
+
+
+@pytest.mark.parametrize("sql", [
+    'SELECT count(*) AS "Order ID" FROM df WHERE "Order ID" = \'NG-1001\'',
+    "SELECT median(Quantity) FROM df",
+    'SELECT count(DISTINCT "Customer Region") FROM df',
+    "SELECT * FROM df",
+])
+def test_unsupported_queries_are_not_rewritten(rollup_con, sql):
+    con, rollup = rollup_con
+    assert rollup.rewrite(con, sql) is None
+
+
+class BrokenRollup:
+    def rewrite(self, con, sql):
+        return "SELECT no_such_column FROM __rollup"
+
+
+def test_failed_rewrite_falls_back_to_original_query(frame):
+    sql = "SELECT count(*) AS n FROM df"
+    conn = connection_manager.get("test-rollup", "test-rollup-fingerprint", frame)
+    conn.rollup = BrokenRollup()
+    try:
+        result = execute_sql(
+            frame, sql, fingerprint="test-rollup-fingerprint", session_id="test-rollup", use_rollup=True
+        )
+    finally:
+        connection_manager.close("test-rollup")
+
+    assert result.rewritten_sql is None
+    assert result.table.column("n").to_pylist() == [len(frame)]
@@ -0,0 +1,47 @@
+import gc
+import os
+
+import pandas as pd
+import pytest
+
+from core import worker_pool
+from core.worker_pool import MAX_SHARED_DATASETS, WorkerPool
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(worker_pool, "SHARED_DATASET_DIR", str(tmp_path))
+    return WorkerPool(size=1, timeout=60)
+
+
+def frame(n):
+    return pd.DataFrame({"a": range(n)})
+
+
+def test_exports_in_use_are_never_deleted(pool):
+    held = [pool.share_dataset(f"k{i}", frame(i + 1)) for i in range(MAX_SHARED_DATASETS + 2)]
+    assert all(os.path.exists(ref["path"]) for ref in held)
+
+    paths = [ref["path"] for ref in held]
+    while held:
+        held.pop(0)
+    gc.collect()
+    # Once released, only the most recently shared unused exports are kept
+    assert [os.path.exists(path) for path in paths] == [False] * 2 + [True] * MAX_SHARED_DATASETS
+
+
+def test_shared_export_is_reused(pool):
+    first = pool.share_dataset("k", frame(3))
+    mtime = os.path.getmtime(first["path"])
+    second = pool.share_dataset("k", frame(3))
+
+    assert second == first and second is not first
+    assert os.path.getmtime(second["path"]) == mtime
+
+
+def test_job_runs_on_shared_dataset(pool):
+    job = pool.submit("total = int(df['a'].sum())\nprint(total)", pool.share_dataset("k", frame(4)))
+    payload = job.result(timeout=60)
+
+    assert payload["error"] is None
+    assert payload["printed"] == "6"